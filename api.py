@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+
+from rollups import DAY, GRANULARITIES, store_cube
+from transaction_cache import cache_path, read_store
+from transaction_parser import SOLD, BOUGHT, LINES, UNITS, MONEY
+from transaction_store import TransactionStore
+
+# JSON endpoints over parsed uploads, addressed by the log's sha256 digest:
+#   /api/logs/<digest>/top-items       ?action=sold&granularity=day&rankby=lines&limit=5
+#   /api/logs/<digest>/top-players     ?action=bought&start=2023-07-01&end=2023-07-31
+#   /api/logs/<digest>/players/<player>/history
+#   /api/logs/<digest>/items/<item_id>/prices
+# Every endpoint takes start/end (inclusive dates) and page/per_page. A log's digest names
+# its content, so a response for a given URL never changes and can be cached for good.
+api = Blueprint('api', __name__, url_prefix='/api')
+
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 1000
+MAX_DATASETS = 8
+MAX_RESPONSES = 256
+
+# Rankings measure names used by the cube for each item weight
+CUBE_MEASURES = {LINES: "transactions", UNITS: "units", MONEY: "money"}
+
+# Parsed logs read back from uploads/cache and rendered responses, least recently used dropped first
+datasets = OrderedDict()
+datasets_lock = threading.Lock()
+responses = OrderedDict()
+responses_lock = threading.Lock()
+
+
+def get_dataset(digest):
+    if not DIGEST_PATTERN.fullmatch(digest):
+        abort(404)
+    with datasets_lock:
+        if digest in datasets:
+            datasets.move_to_end(digest)
+            return datasets[digest]
+
+    path = cache_path(os.path.join(current_app.config['UPLOAD_FOLDER'], 'cache'), digest)
+    try:
+        dataset = read_store(path)
+    except FileNotFoundError:
+        abort(404)
+
+    with datasets_lock:
+        datasets[digest] = dataset
+        while len(datasets) > MAX_DATASETS:
+            datasets.popitem(last=False)
+    return dataset
+
+
+def require_store(dataset):
+    # Logs parsed with PARSE_WORKERS > 1 are cached as per-day totals without the rows
+    if not isinstance(dataset, TransactionStore):
+        error(409, "This log was parsed without keeping its transactions")
+    return dataset
+
+
+def error(status, message):
+    response = jsonify({"error": message})
+    response.status_code = status
+    abort(response)
+
+
+def get_action():
+    action = request.args.get('action', SOLD)
+    if action not in (SOLD, BOUGHT):
+        error(400, f"action must be {SOLD} or {BOUGHT}")
+    return action
+
+
+def get_date(name):
+    value = request.args.get(name)
+    if value is not None and not DATE_PATTERN.fullmatch(value):
+        error(400, f"{name} must be a YYYY-MM-DD date")
+    return value
+
+
+def get_positive_int(name, default, maximum=None):
+    value = request.args.get(name, default, type=int)
+    if value is None or value < 1:
+        error(400, f"{name} must be a positive integer")
+    return min(value, maximum) if maximum else value
+
+
+def paginate(results):
+    page = get_positive_int('page', 1)
+    per_page = get_positive_int('per_page', DEFAULT_PER_PAGE, MAX_PER_PAGE)
+    first = (page - 1) * per_page
+    return {"page": page, "per_page": per_page, "total": len(results), "results": results[first:first + per_page]}
+
+
+def cached_json(view):
+    # Render through the response cache; the ETag is the body's hash so polls get a 304
+    key = request.full_path
+    with responses_lock:
+        cached = responses.get(key)
+        if cached is not None:
+            responses.move_to_end(key)
+
+    if cached is None:
+        body = json.dumps(view(), separators=(",", ":"))
+        cached = (hashlib.sha1(body.encode("utf-8")).hexdigest(), body)
+        with responses_lock:
+            responses[key] = cached
+            while len(responses) > MAX_RESPONSES:
+                responses.popitem(last=False)
+
+    etag, body = cached
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def ranked_per_bucket(dataset, group_by, action, weight, limit):
+    granularity = request.args.get('granularity', DAY)
+    if granularity not in GRANULARITIES:
+        error(400, f"granularity must be one of {', '.join(GRANULARITIES)}")
+    start = get_date('start')
+    end = get_date('end')
+    filters = {name: request.args[name] for name in ('player', 'screen') if name in request.args}
+    if 'item' in request.args:
+        # Items are filtered by id, e.g. item=Mobs.4
+        filters['item'] = request.args['item']
+
+    if granularity == DAY and not filters:
+        # Plain per-day rankings are precomputed with the upload, cached logs of any kind have them
+        if group_by == "item":
+            ranked = dataset.rank_items(action, limit, weight)
+        else:
+            ranked = dataset.rank_players(action, limit)
+        return {date: entries for date, entries in ranked.items()
+                if (start is None or date >= start) and (end is None or date <= end)}
+
+    cube = store_cube(require_store(dataset))
+    item_id = filters.pop('item', None)
+    if item_id is not None:
+        filters['item'] = next((item for item in dataset.items.values if item[1] == item_id), None)
+        if filters['item'] is None:
+            return {}
+    return cube.top(granularity, (group_by,), CUBE_MEASURES[weight], limit, action=action, start=start, end=end,
+                    **filters)
+
+
+@api.route('/logs/<digest>/top-items')
+def top_items(digest):
+    def view():
+        dataset = get_dataset(digest)
+        weight = request.args.get('rankby', LINES)
+        if weight not in CUBE_MEASURES:
+            error(400, f"rankby must be one of {', '.join(CUBE_MEASURES)}")
+        ranked = ranked_per_bucket(dataset, "item", get_action(), weight, get_positive_int('limit', 10))
+        return paginate([{"bucket": bucket,
+                          "items": [{"name": name, "item_id": item_id, weight: total}
+                                    for (name, item_id), total in entries]}
+                         for bucket, entries in ranked.items()])
+
+    return cached_json(view)
+
+
+@api.route('/logs/<digest>/top-players')
+def top_players(digest):
+    def view():
+        dataset = get_dataset(digest)
+        ranked = ranked_per_bucket(dataset, "player", get_action(), MONEY, get_positive_int('limit', 10))
+        return paginate([{"bucket": bucket,
+                          "players": [{"player": player, "money": total} for player, total in entries]}
+                         for bucket, entries in ranked.items()])
+
+    return cached_json(view)
+
+
+@api.route('/logs/<digest>/players/<player>/history')
+def player_history(digest, player):
+    def view():
+        store = require_store(get_dataset(digest))
+        action = get_action() if 'action' in request.args else None
+        return paginate(store.player_history(player, action, get_date('start'), get_date('end')))
+
+    return cached_json(view)
+
+
+@api.route('/logs/<digest>/items/<item_id>/prices')
+def item_prices(digest, item_id):
+    def view():
+        store = require_store(get_dataset(digest))
+        action = get_action() if 'action' in request.args else None
+        return paginate(store.item_prices(item_id, action, get_date('start'), get_date('end'),
+                                          request.args.get('player')))
+
+    return cached_json(view)
@@ -1,311 +1,503 @@
-import importlib
-import subprocess
-
-# List of required dependencies
-REQUIRED_PACKAGES = [
-    'flask',
-    'openpyxl'
-]
-
-# Check and install missing dependencies
-for package in REQUIRED_PACKAGES:
-    try:
-        importlib.import_module(package)
-    except ImportError:
-        subprocess.check_call(['pip', 'install', package])
-
-# Import the required modules
-from flask import Flask, render_template, request, send_from_directory, redirect, send_file
+from flask import Flask, render_template, request, send_from_directory, redirect, send_file, abort, jsonify, url_for
+import atexit
 import os
-import re
-from collections import defaultdict
-from openpyxl import Workbook
+import threading
+from engine import rank_results
+from excel_export import create_excel_file
+from transaction_parser import SOLD, BOUGHT, LINES, UNITS, MONEY, TransactionSummary
+from transaction_store import TransactionStore
+from transaction_cache import (DEFAULT_CACHE_MAX_BYTES, DEFAULT_OUTPUT_MAX_BYTES, artifact_name, cache_store,
+                               evict_cache, load_cached_store, read_cached_store, save_upload, touch_cached_store)
+from ingest import ChunkPipe, ingest_stream
+from log_merge import expand_sources, merge_logs, merged_digest, server_name, summarize_logs
+from log_follower import LogFollower
+from jobs import DONE, DEFAULT_JOB_WORKERS, JobQueue
+from api import api, paginate
+from instrumentation import metrics, profile_call
+from warehouse import Warehouse
+from rollups import DAY, WEEK, MONTH
+from sketches import SketchSummary
 
 app = Flask(__name__)
-
-def create_excel_file(file_path, sheet_data, most_sold_items=None, most_bought_items=None, item_limit=None, player_limit=None):
-    # Delete existing file if it exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
-    wb = Workbook()
-
-    for sheet_name, day_data in sheet_data.items():
-        sheet = wb.create_sheet(title=sheet_name)
-        sheet["A1"] = "Date"
-        sheet["B1"] = "Player"
-        sheet["C1"] = "Amount"
-
-        row = 2
-        for date, players in day_data.items():
-            sheet.cell(row=row, column=1).value = date
-            col = 2
-            for player, amount in players:
-                sheet.cell(row=row, column=col).value = player
-                sheet.cell(row=row, column=col + 1).value = amount
-                col += 2
-            row += 1
-
-        # Adjust cell width for the sheet
-        for column_cells in sheet.columns:
-            max_length = 0
-            column = column_cells[0].column_letter
-            for cell in column_cells:
-                if cell.coordinate == f"{column}1":
-                    continue
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2) * 1.2
-            sheet.column_dimensions[column].width = adjusted_width
-
-    if most_sold_items:
-        sold_sheet = wb.create_sheet(title="Most Sold Items")
-        sold_sheet["A1"] = "Date"
-        sold_sheet["B1"] = "Most Sold Items"
-
-        row = 2
-        for date, items in most_sold_items.items():
-            sold_sheet[f"A{row}"] = date
-            if item_limit:
-                items = items[:item_limit]
-            col = 2
-            for item in items:
-                sold_sheet.cell(row=row, column=col).value = item
-                col += 1
-            row += 1
-
-        # Adjust cell width for the most sold items sheet
-        for column_cells in sold_sheet.columns:
-            max_length = 0
-            column = column_cells[0].column_letter
-            for cell in column_cells:
-                if cell.coordinate == f"{column}1":
-                    continue
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length + 2) * 1.2
-            sold_sheet.column_dimensions[column].width = adjusted_width
-
-    if most_bought_items:
-        bought_sheet = wb.create_sheet(title="Most Bought Items")
-        bought_sheet["A1"] = "Date"
-        bought_sheet["B1"] = "Most Bought Items"
-
-        row = 2
-        for date, items in most_bought_items.items():
-            bought_sheet[f"A{row}"] = date
-            if item_limit:
-                items = items[:item_limit]
-            col = 2
-            for item in items:
-                bought_sheet.cell(row=row, column=col).value = item
-                col += 1
-            row += 1
-
-        # Adjust cell width for the most bought items sheet
-        for column_cells in bought_sheet.columns:
-            max_length = 0
-            column = column_cells[0].column_letter
-            for cell in column_cells:
-                if cell.coordinate == f"{column}1":
-                    continue
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length + 2) * 1.2
-            bought_sheet.column_dimensions[column].width = adjusted_width
-
-    wb.save(file_path)
-    print(f"Excel file saved successfully at: {file_path}")
-
-
-from collections import defaultdict
-
-def find_most_sell_players_per_day(file_path, player_limit=None):
-    sell_players_per_day = defaultdict(list)
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            if "sold" in line.lower():
-                date_info = re.search(r"\[(\d{4}-\d{2}-\d{2})\s\d{2}:\d{2}:\d{2}\]", line)
-                player_info = re.search(r"\[\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2}\] - (\w+) sold", line)
-                amount_info = re.search(r"for\s+\$([\d,\.]+)", line)
-                if date_info and player_info and amount_info:
-                    date = date_info.group(1)
-                    player = player_info.group(1).strip()
-                    amount = float(amount_info.group(1).replace(",", ""))
-                    amount = round(amount, 2)  # Round up to 2 decimal places
-                    sell_players_per_day[date].append((player, amount))
-
-    sell_players_per_day_sorted = {}
-    for date, players in sell_players_per_day.items():
-        player_sum = defaultdict(float)
-        for player, amount in players:
-            player_sum[player] += amount
-
-        players_sorted = sorted(player_sum.items(), key=lambda x: x[1], reverse=True)
-        if player_limit:
-            players_sorted = players_sorted[:player_limit]
-        sell_players_per_day_sorted[date] = players_sorted
-
-    return sell_players_per_day_sorted
-
-
-def find_most_buy_players_per_day(file_path, player_limit=None):
-    buy_players_per_day = defaultdict(list)
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            if "bought" in line.lower():
-                date_info = re.search(r"\[(\d{4}-\d{2}-\d{2})\s\d{2}:\d{2}:\d{2}\]", line)
-                player_info = re.search(r"\[\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2}\] - (\w+) bought", line)
-                amount_info = re.search(r"for\s+\$([\d,\.]+)", line)
-                if date_info and player_info and amount_info:
-                    date = date_info.group(1)
-                    player = player_info.group(1).strip()
-                    amount = float(amount_info.group(1).replace(",", ""))
-                    amount = round(amount, 2)  # Round up to 2 decimal places
-                    buy_players_per_day[date].append((player, amount))
-
-    buy_players_per_day_sorted = {}
-    for date, players in buy_players_per_day.items():
-        player_sum = defaultdict(float)
-        for player, amount in players:
-            player_sum[player] += amount
-
-        players_sorted = sorted(player_sum.items(), key=lambda x: x[1], reverse=True)
-        if player_limit:
-            players_sorted = players_sorted[:player_limit]
-        buy_players_per_day_sorted[date] = players_sorted
-
-    return buy_players_per_day_sorted
-
-
-
-def find_most_sold_items_per_day(file_path, include_id=True):
-    sold_items_per_day = defaultdict(list)
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            if "sold" in line.lower():
-                date = line.split()[0][1:]
-                item_info = line.split("sold")[1].strip()
-                item = extract_item_name(item_info)
-                sold_items_per_day[date].append(item)
-
-    most_sold_items_per_day = {}
-    for date, items in sold_items_per_day.items():
-        item_count = defaultdict(int)
-        for item in items:
-            item_count[item] += 1
-        sorted_items = sorted(item_count.items(), key=lambda x: x[1], reverse=True)
-        most_sold_items = []
-        for item, count in sorted_items:
-            if include_id:
-                most_sold_items.append(f"{item}x{count}")
-            else:
-                item_name = item.split("(")[0].strip()
-                most_sold_items.append(f"{item_name}x{count}")
-        most_sold_items_per_day[date] = most_sold_items
-
-    return most_sold_items_per_day
-
-
-def find_most_bought_items_per_day(file_path, include_id=True):
-    bought_items_per_day = defaultdict(list)
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            if "bought" in line.lower():
-                date = line.split()[0][1:]
-                item_info = line.split("bought")[1].strip()
-                item = extract_item_name(item_info)
-                bought_items_per_day[date].append(item)
-
-    most_bought_items_per_day = {}
-    for date, items in bought_items_per_day.items():
-        item_count = defaultdict(int)
-        for item in items:
-            item_count[item] += 1
-        sorted_items = sorted(item_count.items(), key=lambda x: x[1], reverse=True)
-        most_bought_items = []
-        for item, count in sorted_items:
-            if include_id:
-                most_bought_items.append(f"{item}x{count}")
-            else:
-                item_name = item.split("(")[0].strip()
-                most_bought_items.append(f"{item_name}x{count}")
-        most_bought_items_per_day[date] = most_bought_items
-
-    return most_bought_items_per_day
-
-
-def extract_item_name(item_info):
-    item_parts = item_info.split("x")
-    if len(item_parts) < 2:
-        return item_info.strip()
-
-    item_name = "x".join(item_parts[1:]).strip().split("for")[0].strip()
-    return item_name
+# JSON query endpoints under /api, see api.py
+app.register_blueprint(api)
+
+# Follower for the live log configured in FOLLOW_LOG_PATH, created on first use
+live_follower = None
+live_follower_lock = threading.Lock()
+
+# Background workers for uploads, created on first use with JOB_WORKERS threads
+job_queue = None
+job_queue_lock = threading.Lock()
+
+# SQLite warehouse in WAREHOUSE_PATH every parsed upload is added to, opened on first use
+warehouse = None
+warehouse_lock = threading.Lock()
+
+# Tables on the results page: result key -> (title, column headings)
+RESULT_TABLES = {
+    "most_sold_items": ("Most Sold Items per Day", ("Date", "Most Sold Items")),
+    "most_bought_items": ("Most Bought Items per Day", ("Date", "Most Bought Items")),
+    "buy_players_per_day": ("Most Buy Players per Day", ("Date", "Player", "Amount")),
+    "sell_players_per_day": ("Most Sell Players per Day", ("Date", "Player", "Amount")),
+    "unique_players": ("Unique Players per Day (estimated)", ("Date", "Buyers", "Sellers")),
+}
+# Rows rendered with the results page, the rest are fetched page by page as the user scrolls
+RESULTS_PAGE_SIZE = 50
+
+
+def table_rows(results, server=None):
+    # Flatten the per-day rankings into the rows shown on the results page, once per result.
+    # A server's tables are keyed "<table>:<server>".
+    suffix = f":{server}" if server is not None else ""
+    rows = {}
+    for name in ("most_sold_items", "most_bought_items"):
+        rows[name + suffix] = [[date, ", ".join(items)] for date, items in results[name].items()]
+    for name in ("buy_players_per_day", "sell_players_per_day"):
+        rows[name + suffix] = [[date, player, amount] for date, players in results[name].items()
+                               for player, amount in players]
+    return rows
+
+def unique_player_rows(summary, server=None):
+    # Estimated distinct buyers and sellers per bucket of a SketchSummary
+    buyers = summary.unique_players(BOUGHT)
+    sellers = summary.unique_players(SOLD)
+    suffix = f":{server}" if server is not None else ""
+    return {"unique_players" + suffix: [[date, buyers.get(date, 0), sellers.get(date, 0)]
+                                        for date in dict.fromkeys([*buyers, *sellers])]}
+
+def render_results(rows, job_id=None):
+    # For a finished job only the first page of each table is rendered, the page's script
+    # loads the rest from job_table; without a job (/live) every row is rendered
+    tables = []
+    for key, entries in rows.items():
+        name, _, server = key.partition(":")
+        title, headings = RESULT_TABLES[name]
+        tables.append({
+            "name": key,
+            "title": f"{title} ({server})" if server else title,
+            "headings": headings,
+            "total": len(entries),
+            "first_date": entries[0][0] if entries else None,
+            "last_date": entries[-1][0] if entries else None,
+            "rows": entries[:RESULTS_PAGE_SIZE] if job_id else entries,
+        })
+    return render_template('results.html', job_id=job_id, tables=tables, page_size=RESULTS_PAGE_SIZE)
+
+def get_item_weight(values):
+    weight = values.get('rankby', LINES)
+    return weight if weight in (LINES, UNITS, MONEY) else LINES
+
+def get_approximate(values):
+    # Bucket size for approximate (sketch) results of merged logs, None for exact results
+    granularity = values.get('approximate')
+    return granularity if granularity in (DAY, WEEK, MONTH) else None
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/upload', methods=['POST'])
-def upload():
-    log_file = request.files['logfile']
-    item_limit = int(request.form['itemlimit'])
-    player_limit = int(request.form['playerlimit'])
-    include_item_id = 'includeid' in request.form
-
-    # Save the uploaded log file to a temporary location
-    log_file_path = os.path.join(app.config['UPLOAD_FOLDER'], log_file.filename)
-    log_file.save(log_file_path)
-
-    # Process the log file and generate the data
-    most_sold_items = find_most_sold_items_per_day(log_file_path, include_id=include_item_id)
-    most_bought_items = find_most_bought_items_per_day(log_file_path, include_id=include_item_id)
-    most_sold_items_limited = {date: items[:item_limit] if item_limit else items for date, items in
-                               most_sold_items.items()}
-    most_bought_items_limited = {date: items[:item_limit] if item_limit else items for date, items in
-                                most_bought_items.items()}
+def process_upload(job, log_file_path, digest, item_limit, player_limit, include_item_id, weight=LINES):
+    # Runs on a job worker thread; job.update_progress is fed the bytes parsed so far
+    # With METRICS on, each stage's time is also kept on the job and shown in its status
+    cache_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+    with metrics.stage("parse", job.stages) as stage:
+        summary = load_cached_store(cache_folder, digest, log_file_path,
+                                    max_bytes=app.config.get('CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES),
+                                    workers=app.config.get('PARSE_WORKERS', 1),
+                                    progress=job.update_progress)
+        stage.count(lines=summary.line_count if isinstance(summary, TransactionSummary) else len(summary),
+                    bytes=job.bytes_total)
+    # Summaries from the parallel parser keep totals only, there are no lines to store
+    if isinstance(summary, TransactionStore):
+        add_to_warehouse(job, summary)
+    return build_results(job, summary, digest, item_limit, player_limit, include_item_id, weight)
+
+def process_saved(job, file_paths, function, *args):
+    # Runs a job function on uploads saved for it in UPLOAD_FOLDER, which go once it ends
+    try:
+        return function(job, *args)
+    finally:
+        discard_uploads(file_paths)
 
-    buy_players_per_day = find_most_buy_players_per_day(log_file_path, player_limit=5)
-    sell_players_per_day = find_most_sell_players_per_day(log_file_path, player_limit=5)
+def process_stream(job, pipe, item_limit, player_limit, include_item_id, weight=LINES):
+    # Parses the upload while the request thread is still receiving it; progress is bytes received
+    try:
+        with metrics.stage("parse", job.stages) as stage:
+            store, digest, _ = ingest_stream(pipe, app.config['UPLOAD_FOLDER'], app.config.get('KEEP_UPLOADS', False))
+            stage.count(lines=len(store), bytes=pipe.bytes_read)
+    finally:
+        pipe.close()
+
+    # Raw streams cannot be hashed before parsing; a log seen before only skips the cache write
+    cache_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+    if not touch_cached_store(cache_folder, digest):
+        with metrics.stage("cache_write", job.stages):
+            cache_store(cache_folder, digest, store,
+                        max_bytes=app.config.get('CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+    add_to_warehouse(job, store)
+    return build_results(job, store, digest, item_limit, player_limit, include_item_id, weight)
+
+def process_cached(job, digest, item_limit, player_limit, include_item_id, weight=LINES):
+    # A form upload whose digest was found in the cache: nothing is parsed
+    with metrics.stage("cache_read", job.stages):
+        summary = read_cached_store(os.path.join(app.config['UPLOAD_FOLDER'], 'cache'), digest)
+    if summary is None:
+        raise ValueError("The parsed log was evicted from the cache before it could be read, upload it again")
+    return build_results(job, summary, digest, item_limit, player_limit, include_item_id, weight)
+
+def process_merge(job, sources, digest, per_server, approximate, item_limit, player_limit, include_item_id,
+                  weight=LINES):
+    # Several logs (rotations, servers) merged in timestamp order in one pass, see log_merge.py.
+    # sources are (server, file path) pairs; per-server rankings come from the same pass.
+    # With approximate set to day, week or month, fixed-size daily sketches (sketches.py) are
+    # kept instead of exact tables and rolled up to that bucket; they are not cached or warehoused.
+    with metrics.stage("parse", job.stages) as stage:
+        if approximate:
+            store, servers = summarize_logs(sources, None, per_server, job.update_progress, SketchSummary)
+            stage.count(lines=store.line_count, bytes=job.bytes_total)
+        else:
+            store, servers = summarize_logs(sources, TransactionStore(), per_server, progress=job.update_progress)
+            stage.count(lines=len(store), bytes=job.bytes_total)
+
+    if approximate:
+        with metrics.stage("rollup", job.stages):
+            store = store.rollup(approximate)
+            servers = {server: summary.rollup(approximate) for server, summary in servers.items()}
+    else:
+        with metrics.stage("cache_write", job.stages):
+            cache_store(os.path.join(app.config['UPLOAD_FOLDER'], 'cache'), digest, store,
+                        max_bytes=app.config.get('CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+        # The merged store has no server column, so the warehouse reads the logs again to tag lines
+        if get_warehouse() is not None:
+            with metrics.stage("warehouse_load", job.stages) as stage:
+                stage.count(lines=get_warehouse().add_all(merge_logs(sources)))
+    results = build_results(job, store, digest, item_limit, player_limit, include_item_id, weight)
+    if approximate:
+        results["rows"].update(unique_player_rows(store))
+
+    with metrics.stage("rank_servers", job.stages):
+        results["servers"] = {server: rank_results(summary, item_limit, player_limit, include_item_id, weight)
+                              for server, summary in sorted(servers.items())}
+    for server, server_results in results["servers"].items():
+        results["rows"].update(table_rows(server_results, server))
+        if approximate:
+            results["rows"].update(unique_player_rows(servers[server], server))
+    return results
+
+def get_warehouse():
+    global warehouse
+    if not app.config.get('WAREHOUSE_PATH'):
+        return None
+    with warehouse_lock:
+        if warehouse is None:
+            warehouse = Warehouse(app.config['WAREHOUSE_PATH'])
+        return warehouse
+
+def add_to_warehouse(job, store):
+    # Lines already in the warehouse (an upload seen before, overlapping logs) are skipped
+    if get_warehouse() is not None:
+        with metrics.stage("warehouse_load", job.stages) as stage:
+            stage.count(lines=get_warehouse().add_store(store))
+
+def touch_output(file_path):
+    # Whether file_path exists; marks it as just used so eviction keeps it for now
+    try:
+        os.utime(file_path)
+        return True
+    except OSError:
+        return False
 
+def write_excel(results, excel_file_path, item_limit=None, player_limit=None):
+    # Workbooks in OUTPUT_FOLDER are kept under OUTPUT_MAX_BYTES, least recently used go first
     sheet_data = {
-        "Most Buy Players per Day": buy_players_per_day,
-        "Most Sell Players per Day": sell_players_per_day
+        "Most Buy Players per Day": results["buy_players_per_day"],
+        "Most Sell Players per Day": results["sell_players_per_day"]
     }
-
-    # Generate the Excel file
-    excel_file_path = os.path.join(app.config['OUTPUT_FOLDER'], "transaction_summary.xlsx")
-    create_excel_file(excel_file_path, sheet_data, most_sold_items_limited, most_bought_items_limited,
+    create_excel_file(excel_file_path, sheet_data, results["most_sold_items"], results["most_bought_items"],
                       item_limit=item_limit, player_limit=player_limit)
+    evict_cache(app.config['OUTPUT_FOLDER'], app.config.get('OUTPUT_MAX_BYTES', DEFAULT_OUTPUT_MAX_BYTES),
+                keep=excel_file_path, extension=".xlsx")
+
+def build_results(job, summary, digest, item_limit, player_limit, include_item_id, weight):
+    with metrics.stage("rank", job.stages):
+        results = rank_results(summary, item_limit, player_limit, include_item_id, weight)
+
+    # The Excel file is named after the log's hash and the options, so a repeat request reuses it
+    excel_file_name = artifact_name(digest, ".xlsx", item_limit=item_limit, player_limit=player_limit,
+                                    include_item_id=include_item_id, weight=weight)
+    excel_file_path = os.path.join(app.config['OUTPUT_FOLDER'], excel_file_name)
+    if not touch_output(excel_file_path):
+        with metrics.stage("excel_export", job.stages):
+            write_excel(results, excel_file_path, item_limit, player_limit)
+
+    results["excel_file_path"] = excel_file_path
+    results["digest"] = digest
+    results["rows"] = table_rows(results)
+    return results
+
+def profile_job(job, function, *args):
+    # Runs a job function with a cProfile dump of it in PROFILE_FOLDER/<job id>.prof
+    profile_path = os.path.join(app.config['PROFILE_FOLDER'], job.id + ".prof")
+    return profile_call(profile_path, function, job, *args)
+
+def get_job_queue():
+    global job_queue
+    with job_queue_lock:
+        if job_queue is None:
+            job_queue = JobQueue(workers=app.config.get('JOB_WORKERS', DEFAULT_JOB_WORKERS))
+        return job_queue
+
+def get_job_or_404(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+def submit_job(bytes_total, function, *args, dedicated=False):
+    # Parsing and the Excel export run in the background; the client polls the job.
+    # A "profile" field asks for a cProfile dump of the job when PROFILE_FOLDER is set.
+    if app.config.get('PROFILE_FOLDER') and 'profile' in request.values:
+        return get_job_queue().submit(bytes_total, profile_job, function, *args, dedicated=dedicated)
+    return get_job_queue().submit(bytes_total, function, *args, dedicated=dedicated)
+
+def stream_upload(stream, bytes_total, *options):
+    # Feed the upload to a parsing job chunk by chunk as it is received. Returns once the
+    # whole request body has been read; the job may still be parsing the last chunks.
+    # The job must be reading before the pipe fills up, so it never waits for a pool worker
+    pipe = ChunkPipe()
+    job = submit_job(bytes_total or 0, process_stream, pipe, *options, dedicated=True)
+    pipe.progress = job.update_progress
+    with metrics.stage("receive") as stage:
+        pipe.pump(stream)
+        stage.count(bytes=pipe.bytes_received)
+    return job
+
+def save_log_upload(log_file):
+    # Save a form upload (plain or gzip) for a job to parse, see save_upload; unless
+    # KEEP_UPLOADS is set it gets a temporary name and is discarded after parsing
+    try:
+        return save_upload(log_file, app.config['UPLOAD_FOLDER'], keep=app.config.get('KEEP_UPLOADS', False))
+    except (OSError, EOFError):
+        # Not gzip after all, or cut short
+        abort(400)
+
+def discard_uploads(file_paths):
+    if app.config.get('KEEP_UPLOADS', False):
+        return
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+def upload_response(job, digest=None):
+    if request.accept_mimetypes.best == 'application/json':
+        # The digest addresses the parsed log in the /api endpoints; for streamed uploads
+        # it is only known once parsing is done and comes with the job status
+        status = job.to_dict()
+        if digest is not None:
+            status['digest'] = digest
+        return jsonify(status), 202
+    return redirect(url_for('job_page', job_id=job.id))
+
+def submit_merge(sources, digest, per_server, approximate, *options, uploads=()):
+    # Approximate results get their own address, so they never reuse an exact Excel file.
+    # uploads are saved files the job discards when it is done (the sources of /network stay).
+    if approximate:
+        digest = merged_digest([(f"approximate={approximate}", digest)])
+    bytes_total = sum(os.path.getsize(file_path) for _, file_path in sources)
+    return submit_job(bytes_total, process_saved, list(uploads), process_merge, sources, digest, per_server,
+                      approximate, *options), digest
+
+def merge_upload(log_files, per_server, approximate, *options):
+    # Several files: each is saved (decompressed) for one job that merges them and then
+    # discards them. Sorting by server and digest makes the merge independent of the order
+    # files were picked.
+    entries = []
+    with metrics.stage("save_upload") as stage:
+        try:
+            for log_file in log_files:
+                log_file_path, digest = save_log_upload(log_file)
+                entries.append((server_name(log_file.filename or digest), digest, log_file_path))
+                stage.count(bytes=os.path.getsize(log_file_path))
+        except BaseException:
+            # One unreadable file fails the upload, without leaving the others behind
+            discard_uploads([log_file_path for _, _, log_file_path in entries])
+            raise
+    entries.sort()
+
+    sources = [(server, log_file_path) for server, _, log_file_path in entries]
+    digest = merged_digest((server, digest) for server, digest, _ in entries)
+    return submit_merge(sources, digest, per_server, approximate, *options,
+                        uploads=[log_file_path for _, log_file_path in sources])
 
-    return render_template('results.html',
-                           most_sold_items=most_sold_items_limited,
-                           most_bought_items=most_bought_items_limited,
-                           buy_players_per_day=buy_players_per_day,
-                           sell_players_per_day=sell_players_per_day)
-
-@app.route('/download')
-def download():
-    excel_file_path = os.path.join(app.config['OUTPUT_FOLDER'], "transaction_summary.xlsx")
+@app.route('/upload', methods=['POST'])
+def upload():
+    log_files = request.files.getlist('logfile')
+    item_limit = int(request.form['itemlimit'])
+    player_limit = int(request.form['playerlimit'])
+    include_item_id = 'includeid' in request.form
+    weight = get_item_weight(request.form)
+    options = (item_limit, player_limit, include_item_id, weight)
+
+    # Approximate results come from the merge path, which also takes a single (long) log
+    approximate = get_approximate(request.form)
+    if len(log_files) > 1 or approximate:
+        per_server = 'perserver' in request.form and len(log_files) > 1
+        return upload_response(*merge_upload(log_files, per_server, approximate, *options))
+
+    # Werkzeug has received the whole form before the view runs, so the log is copied out
+    # (and hashed) at disk speed and the job parses the saved file. A log parsed before
+    # (also as plain text vs gzip) is answered from the cache.
+    with metrics.stage("save_upload") as stage:
+        log_file_path, digest = save_log_upload(log_files[0])
+        stage.count(bytes=os.path.getsize(log_file_path))
+    if touch_cached_store(os.path.join(app.config['UPLOAD_FOLDER'], 'cache'), digest):
+        discard_uploads([log_file_path])
+        return upload_response(submit_job(0, process_cached, digest, *options), digest)
+
+    job = submit_job(os.path.getsize(log_file_path), process_saved, [log_file_path],
+                     process_upload, log_file_path, digest, *options)
+    return upload_response(job, digest)
+
+@app.route('/upload/stream', methods=['POST', 'PUT'])
+def upload_stream():
+    # The request body is the log itself (plain or gzip), so nothing is spooled to disk:
+    #   curl -T transaction-log.txt.gz "http://host:25569/upload/stream?itemlimit=5&playerlimit=5"
+    item_limit = request.args.get('itemlimit', 5, type=int)
+    player_limit = request.args.get('playerlimit', 5, type=int)
+    include_item_id = 'includeid' in request.args
+    weight = get_item_weight(request.args)
+    job = stream_upload(request.stream, request.content_length, item_limit, player_limit, include_item_id, weight)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    job = get_job_or_404(job_id)
+    if job.status != DONE:
+        return render_template('job.html', job=job)
+
+    return render_results(job.result['rows'], job_id=job.id)
+
+@app.route('/jobs/<job_id>/tables/<table>')
+def job_table(job_id, table):
+    # One page of a results table, sliced from the rows built when the job finished
+    job = get_job_or_404(job_id)
+    if job.status != DONE or table not in job.result['rows']:
+        abort(404)
+    return jsonify(paginate(job.result['rows'][table]))
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    job = get_job_or_404(job_id)
+    status = job.to_dict()
+    if job.status == DONE:
+        status['digest'] = job.result['digest']
+    return jsonify(status)
+
+def get_live_follower():
+    global live_follower
+    with live_follower_lock:
+        if live_follower is None:
+            live_follower = LogFollower(app.config['FOLLOW_LOG_PATH'], state_path=app.config.get('FOLLOW_STATE_PATH'))
+            # State is saved every few polls only, so write out the rest on shutdown
+            atexit.register(live_follower.close)
+        return live_follower
+
+@app.route('/live')
+def live():
+    if not app.config.get('FOLLOW_LOG_PATH'):
+        return redirect('/')
+
+    item_limit = request.args.get('itemlimit', 5, type=int)
+    player_limit = request.args.get('playerlimit', 5, type=int)
+    include_item_id = 'includeid' in request.args
+    weight = get_item_weight(request.args)
+
+    # Only the bytes appended since the last request are parsed. Ranking holds the follower's
+    # lock, so a poll from another request cannot change the summary halfway through.
+    follower = get_live_follower()
+    follower.poll()
+    results = follower.query(rank_results, item_limit, player_limit, include_item_id, weight)
+
+    return render_results(table_rows(results))
+
+@app.route('/network')
+def network():
+    # Merge the server logs configured in SERVER_LOGS (see log_merge.expand_sources).
+    # ?approximate=day|week|month ranks fixed-size sketches instead, for logs spanning months.
+    if not app.config.get('SERVER_LOGS'):
+        return redirect('/')
+
+    item_limit = request.args.get('itemlimit', 5, type=int)
+    player_limit = request.args.get('playerlimit', 5, type=int)
+    include_item_id = 'includeid' in request.args
+    weight = get_item_weight(request.args)
+
+    sources = expand_sources(app.config['SERVER_LOGS'])
+    if not sources:
+        abort(404)
+    # Files on disk change in place, so the dataset is addressed by their size and mtime
+    stats = [os.stat(file_path) for _, file_path in sources]
+    digest = merged_digest((server, f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}")
+                           for (server, file_path), stat in zip(sources, stats))
+    job, digest = submit_merge(sources, digest, 'perserver' in request.args, get_approximate(request.args),
+                               item_limit, player_limit, include_item_id, weight)
+    return upload_response(job, digest)
+
+@app.route('/warehouse')
+def warehouse_results():
+    # Rankings over everything uploaded so far, optionally for a date range and/or one server
+    if get_warehouse() is None:
+        return redirect('/')
+
+    item_limit = request.args.get('itemlimit', 5, type=int)
+    player_limit = request.args.get('playerlimit', 5, type=int)
+    include_item_id = 'includeid' in request.args
+    weight = get_item_weight(request.args)
+
+    query = get_warehouse().query(request.args.get('start') or None, request.args.get('end') or None,
+                                 request.args.get('server') or None)
+    return render_results(table_rows(rank_results(query, item_limit, player_limit, include_item_id, weight)))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Stage timings in Prometheus text format, only served when METRICS is switched on
+    if not metrics.enabled:
+        abort(404)
+    return metrics.prometheus_text(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/download/<job_id>')
+def download(job_id):
+    job = get_job_or_404(job_id)
+    if job.status != DONE:
+        abort(404)
+    excel_file_path = job.result['excel_file_path']
+    if not touch_output(excel_file_path):
+        # Evicted since the job finished; its rankings are already cut to the limits
+        write_excel(job.result, excel_file_path)
     return send_file(excel_file_path, as_attachment=True, download_name="transaction_summary.xlsx")
 
 if __name__ == '__main__':
     app.config['UPLOAD_FOLDER'] = 'uploads'  # Folder to store uploaded files
     app.config['OUTPUT_FOLDER'] = 'output'  # Folder to store generated Excel file
+    app.config['CACHE_MAX_BYTES'] = DEFAULT_CACHE_MAX_BYTES  # Size limit for cached parsed logs in uploads/cache
+    app.config['OUTPUT_MAX_BYTES'] = DEFAULT_OUTPUT_MAX_BYTES  # Size limit for the Excel files in OUTPUT_FOLDER
+    app.config['PARSE_WORKERS'] = int(os.environ.get('PARSE_WORKERS', 1))  # Processes used to parse large uploads
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', DEFAULT_JOB_WORKERS))  # Uploads processed at once
+    app.config['FOLLOW_LOG_PATH'] = os.environ.get('FOLLOW_LOG_PATH')  # Live log shown at /live (optional)
+    app.config['FOLLOW_STATE_PATH'] = os.environ.get('FOLLOW_STATE_PATH')  # Where /live keeps its offset and totals
+    # Server logs merged at /network: patterns separated by os.pathsep, "name=" sets the server,
+    # e.g. "survival=/srv/survival/logs/*:lobby=/srv/lobby/logs/*"
+    app.config['SERVER_LOGS'] = [pattern for pattern in os.environ.get('SERVER_LOGS', '').split(os.pathsep) if pattern]
+    app.config['KEEP_UPLOADS'] = os.environ.get('KEEP_UPLOADS') == '1'  # Keep uploaded logs in UPLOAD_FOLDER after parsing
+    app.config['PROFILE_FOLDER'] = os.environ.get('PROFILE_FOLDER')  # Where uploads sent with "profile" dump cProfile stats
+    app.config['WAREHOUSE_PATH'] = os.environ.get('WAREHOUSE_PATH')  # SQLite file keeping every upload, served at /warehouse
+    # Stage timings served at /metrics; METRICS_TRACE_MEMORY=1 adds tracemalloc allocation peaks
+    metrics.configure(os.environ.get('METRICS') == '1', trace_memory=os.environ.get('METRICS_TRACE_MEMORY') == '1')
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+    if app.config['PROFILE_FOLDER']:
+        os.makedirs(app.config['PROFILE_FOLDER'], exist_ok=True)
     app.run(host='0.0.0.0', port=25569)
@@ -0,0 +1,211 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import rank_results
+from excel_export import create_excel_file
+from log_merge import expand_sources, iter_log_transactions
+from transaction_parser import SOLD, BOUGHT, LINES, UNITS, MONEY, TransactionSummary
+
+# Headless batch processing of log files, e.g. from a nightly cron job:
+#   python batch.py "logs/*.log*" /srv/lobby/logs --output reports --format xlsx,csv,json
+#   python batch.py /srv/*/logs --output reports --since reports/manifest.json
+# Files (plain or .gz) are parsed in a process pool; each gets its own summary files and all
+# of them together a "combined" one. With --since, files whose size and mtime match the
+# manifest are skipped and the summaries stored for them are reused for the combined output.
+
+FORMATS = ("xlsx", "csv", "json")
+MANIFEST_VERSION = 1
+COMBINED_NAME = "combined"
+
+# Columns of the CSV output, one row per ranked entry; players have no item id
+RANKING_FIELDS = ("table", "date", "rank", "name", "item_id", "value")
+
+
+def output_names(file_paths):
+    # Output name per log: its file name without .gz, plus a hash of the full path when two
+    # logs in different directories share a name (e.g. every server's latest.log)
+    names = [os.path.basename(file_path).removesuffix(".gz") for file_path in file_paths]
+    repeated = {name for name in names if names.count(name) > 1}
+    return [f"{name}-{hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:8]}"
+            if name in repeated else name
+            for name, file_path in zip(names, file_paths)]
+
+
+def ranking_rows(summary, item_limit, player_limit, weight):
+    # Raw rankings for CSV and JSON: numbers rather than the "Namex12" text of the web tables
+    for table, action in (("most_sold_items", SOLD), ("most_bought_items", BOUGHT)):
+        for date, items in summary.rank_items(action, item_limit, weight).items():
+            for rank, ((name, item_id), total) in enumerate(items, start=1):
+                yield table, date, rank, name, item_id, total
+    for table, action in (("buy_players_per_day", BOUGHT), ("sell_players_per_day", SOLD)):
+        for date, players in summary.rank_players(action, player_limit).items():
+            for rank, (player, amount) in enumerate(players, start=1):
+                yield table, date, rank, player, "", amount
+
+
+def write_outputs(summary, base_path, formats, options):
+    # base_path plus ".xlsx", ".csv" and/or ".json"
+    item_limit = options["item_limit"]
+    player_limit = options["player_limit"]
+    weight = options["weight"]
+
+    if "xlsx" in formats:
+        # The same workbook the web app offers for download
+        results = rank_results(summary, item_limit, player_limit, options["include_item_id"], weight)
+        sheet_data = {
+            "Most Buy Players per Day": results["buy_players_per_day"],
+            "Most Sell Players per Day": results["sell_players_per_day"]
+        }
+        create_excel_file(base_path + ".xlsx", sheet_data, results["most_sold_items"], results["most_bought_items"],
+                          item_limit=item_limit, player_limit=player_limit)
+
+    if "csv" in formats:
+        with open(base_path + ".csv", 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(RANKING_FIELDS)
+            writer.writerows(ranking_rows(summary, item_limit, player_limit, weight))
+
+    if "json" in formats:
+        tables = {}
+        for row in ranking_rows(summary, item_limit, player_limit, weight):
+            entry = dict(zip(RANKING_FIELDS[1:], row[1:]))
+            if not entry["item_id"]:
+                del entry["item_id"]
+            tables.setdefault(row[0], []).append(entry)
+        with open(base_path + ".json", 'w', encoding='utf-8') as file:
+            json.dump({"lines": summary.line_count, "weight": weight, "tables": tables}, file, indent=2)
+
+
+def process_file(file_path, base_path, formats, options):
+    # Runs in a worker process; the summary goes back to be stored and combined
+    summary = TransactionSummary().add_all(iter_log_transactions(file_path))
+    write_outputs(summary, base_path, formats, options)
+    return summary
+
+
+def _process_file(task):
+    return process_file(*task)
+
+
+def summary_path(output_dir, file_path):
+    name = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(output_dir, "summaries", name + ".json")
+
+
+def write_json(file_path, data):
+    # Write to a temporary file next to file_path and rename, so a crash never leaves half a file
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_manifest(manifest_path, settings):
+    # Entries of files processed before with the same options and formats; anything else
+    # (no manifest yet, other settings) means every file is new
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as file:
+        manifest = json.load(file)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != settings:
+        return {}
+    return manifest.get("files", {})
+
+
+def run(patterns, output_dir, formats=FORMATS, workers=None, manifest_path=None, combined=True, **options):
+    # Returns (processed, skipped) file paths
+    file_paths = list(dict.fromkeys(os.path.abspath(file_path) for _, file_path in expand_sources(patterns)))
+    names = dict(zip(file_paths, output_names(file_paths)))
+    settings = {"formats": sorted(formats), **options}
+    known = load_manifest(manifest_path, settings) if manifest_path else {}
+
+    stats = {file_path: os.stat(file_path) for file_path in file_paths}
+    pending = []
+    skipped = []
+    for file_path in file_paths:
+        entry = known.get(file_path)
+        stat = stats[file_path]
+        if (entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+                and os.path.exists(summary_path(output_dir, file_path))):
+            skipped.append(file_path)
+        else:
+            pending.append(file_path)
+
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(file_path, os.path.join(output_dir, names[file_path]), formats, options) for file_path in pending]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = dict(zip(pending, pool.map(_process_file, tasks)))
+    else:
+        summaries = dict(zip(pending, map(_process_file, tasks)))
+
+    for file_path, summary in summaries.items():
+        print(f"{file_path}: {summary.line_count:,} lines")
+        if manifest_path:
+            write_json(summary_path(output_dir, file_path), summary.to_dict())
+    for file_path in skipped:
+        print(f"{file_path}: unchanged, skipped")
+
+    if combined and file_paths:
+        # Merged in input order, so ties rank the same as for one concatenated log
+        total = TransactionSummary()
+        for file_path in file_paths:
+            summary = summaries.get(file_path)
+            if summary is None:
+                with open(summary_path(output_dir, file_path), encoding='utf-8') as file:
+                    summary = TransactionSummary.from_dict(json.load(file))
+            total.merge(summary)
+        write_outputs(total, os.path.join(output_dir, COMBINED_NAME), formats, options)
+        print(f"{COMBINED_NAME}: {total.line_count:,} lines from {len(file_paths)} files")
+
+    if manifest_path:
+        files = {file_path: {"size": stats[file_path].st_size, "mtime_ns": stats[file_path].st_mtime_ns}
+                 for file_path in file_paths}
+        write_json(manifest_path, {"version": MANIFEST_VERSION, "settings": settings, "files": files})
+    return pending, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize Economy Shop GUI transaction logs without the web app.")
+    parser.add_argument("logs", nargs="+", help="log files, globs or directories (plain or .gz)")
+    parser.add_argument("--output", default="output", help="directory for the summaries")
+    parser.add_argument("--format", default="xlsx", help="comma separated: " + ", ".join(FORMATS))
+    parser.add_argument("--workers", type=int, help="processes parsing files at once (default: one per CPU)")
+    parser.add_argument("--since", metavar="MANIFEST",
+                        help="skip files unchanged since the run that wrote this manifest, then update it")
+    parser.add_argument("--no-combined", action="store_true", help="only write the per-file summaries")
+    parser.add_argument("--item-limit", type=int, default=5)
+    parser.add_argument("--player-limit", type=int, default=5)
+    parser.add_argument("--include-id", action="store_true", help="show item ids in the Excel summaries")
+    parser.add_argument("--rankby", choices=(LINES, UNITS, MONEY), default=LINES, help="how items are ranked")
+    args = parser.parse_args()
+
+    formats = [name.strip() for name in args.format.split(",") if name.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown or not formats:
+        parser.error(f"unknown format: {', '.join(sorted(unknown)) or args.format}")
+
+    processed, skipped = run(args.logs, args.output, formats, args.workers, args.since, not args.no_combined,
+                             item_limit=args.item_limit, player_limit=args.player_limit,
+                             include_item_id=args.include_id, weight=args.rankby)
+    if not processed and not skipped:
+        print("No log files matched", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
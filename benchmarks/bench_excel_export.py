@@ -0,0 +1,195 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook, load_workbook
+
+from excel_export import create_excel_file
+
+# Compares the streaming write-only export with the in-memory version it replaced.
+# Usage: python benchmarks/bench_excel_export.py [days] [entries_per_day]
+
+
+def legacy_create_excel_file(file_path, sheet_data, most_sold_items=None, most_bought_items=None, item_limit=None, player_limit=None):
+    # Delete existing file if it exists
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+    wb = Workbook()
+
+    for sheet_name, day_data in sheet_data.items():
+        sheet = wb.create_sheet(title=sheet_name)
+        sheet["A1"] = "Date"
+        sheet["B1"] = "Player"
+        sheet["C1"] = "Amount"
+
+        row = 2
+        for date, players in day_data.items():
+            sheet.cell(row=row, column=1).value = date
+            col = 2
+            for player, amount in players:
+                sheet.cell(row=row, column=col).value = player
+                sheet.cell(row=row, column=col + 1).value = amount
+                col += 2
+            row += 1
+
+        # Adjust cell width for the sheet
+        for column_cells in sheet.columns:
+            max_length = 0
+            column = column_cells[0].column_letter
+            for cell in column_cells:
+                if cell.coordinate == f"{column}1":
+                    continue
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = (max_length + 2) * 1.2
+            sheet.column_dimensions[column].width = adjusted_width
+
+    if most_sold_items:
+        sold_sheet = wb.create_sheet(title="Most Sold Items")
+        sold_sheet["A1"] = "Date"
+        sold_sheet["B1"] = "Most Sold Items"
+
+        row = 2
+        for date, items in most_sold_items.items():
+            sold_sheet[f"A{row}"] = date
+            if item_limit:
+                items = items[:item_limit]
+            col = 2
+            for item in items:
+                sold_sheet.cell(row=row, column=col).value = item
+                col += 1
+            row += 1
+
+        # Adjust cell width for the most sold items sheet
+        for column_cells in sold_sheet.columns:
+            max_length = 0
+            column = column_cells[0].column_letter
+            for cell in column_cells:
+                if cell.coordinate == f"{column}1":
+                    continue
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(cell.value)
+                except:
+                    pass
+            adjusted_width = (max_length + 2) * 1.2
+            sold_sheet.column_dimensions[column].width = adjusted_width
+
+    if most_bought_items:
+        bought_sheet = wb.create_sheet(title="Most Bought Items")
+        bought_sheet["A1"] = "Date"
+        bought_sheet["B1"] = "Most Bought Items"
+
+        row = 2
+        for date, items in most_bought_items.items():
+            bought_sheet[f"A{row}"] = date
+            if item_limit:
+                items = items[:item_limit]
+            col = 2
+            for item in items:
+                bought_sheet.cell(row=row, column=col).value = item
+                col += 1
+            row += 1
+
+        # Adjust cell width for the most bought items sheet
+        for column_cells in bought_sheet.columns:
+            max_length = 0
+            column = column_cells[0].column_letter
+            for cell in column_cells:
+                if cell.coordinate == f"{column}1":
+                    continue
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(cell.value)
+                except:
+                    pass
+            adjusted_width = (max_length + 2) * 1.2
+            bought_sheet.column_dimensions[column].width = adjusted_width
+
+    wb.save(file_path)
+    print(f"Excel file saved successfully at: {file_path}")
+
+
+def make_summary(days, entries_per_day):
+    rng = random.Random(42)
+    players = [f"player_{index}" for index in range(entries_per_day * 4)]
+    items = [f"Item {index}(Blocks.{index})" for index in range(entries_per_day * 4)]
+    sheet_data = {"Most Buy Players per Day": {}, "Most Sell Players per Day": {}}
+    most_sold_items = {}
+    most_bought_items = {}
+    for day in range(days):
+        date = f"2023-{1 + day // 28:02d}-{1 + day % 28:02d}"
+        for per_day in sheet_data.values():
+            per_day[date] = [(player, round(rng.uniform(1, 100000), 2))
+                             for player in rng.sample(players, entries_per_day)]
+        most_sold_items[date] = [f"{item}x{rng.randint(1, 500)}" for item in rng.sample(items, entries_per_day)]
+        most_bought_items[date] = [f"{item}x{rng.randint(1, 500)}" for item in rng.sample(items, entries_per_day)]
+    return sheet_data, most_sold_items, most_bought_items
+
+
+def measure(function, *args):
+    # Time an untraced run, then repeat under tracemalloc for the peak allocation
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def sheet_values(file_path):
+    wb = load_workbook(file_path, read_only=True)
+    values = {}
+    for sheet in wb.worksheets:
+        # The legacy export leaves an empty default sheet and pads short rows with empty cells
+        if sheet.title == "Sheet":
+            continue
+        rows = []
+        for row in sheet.iter_rows(values_only=True):
+            row = list(row)
+            while row and row[-1] is None:
+                row.pop()
+            rows.append(row)
+        values[sheet.title] = rows
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the streaming Excel export with the in-memory one.")
+    parser.add_argument("days", type=int, nargs="?", default=120, help="dates in every sheet")
+    parser.add_argument("entries_per_day", type=int, nargs="?", default=200, help="players or items per date")
+    args = parser.parse_args()
+    days = args.days
+    entries_per_day = args.entries_per_day
+    sheet_data, most_sold_items, most_bought_items = make_summary(days, entries_per_day)
+
+    output_dir = tempfile.mkdtemp()
+    legacy_path = os.path.join(output_dir, "legacy.xlsx")
+    streaming_path = os.path.join(output_dir, "streaming.xlsx")
+
+    results = {
+        "legacy": measure(legacy_create_excel_file, legacy_path, sheet_data, most_sold_items, most_bought_items),
+        "streaming": measure(create_excel_file, streaming_path, sheet_data, most_sold_items, most_bought_items),
+    }
+
+    print(f"{days} days x {entries_per_day} entries per day")
+    for name, (elapsed, peak) in results.items():
+        print(f"{name:>10}: {elapsed:8.2f} s  peak {peak / 1024 / 1024:8.1f} MiB")
+    print("same cell values:", sheet_values(legacy_path) == sheet_values(streaming_path))
+
+
+if __name__ == '__main__':
+    main()
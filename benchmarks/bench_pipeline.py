@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import engine
+import legacy_pipeline as legacy
+from excel_export import create_excel_file
+from generate_log import write_log
+from transaction_parser import TransactionSummary, iter_transactions
+from transaction_store import TransactionStore
+
+# Times every stage of turning a log into results (read, parse, aggregate, rank, Excel export,
+# HTML render) for the functions in engine.py and app.py, and the whole original test.py pipeline
+# (legacy_pipeline.py) for comparison.
+# Each stage reports its best time, throughput and peak traced memory.
+# Usage: python benchmarks/bench_pipeline.py --lines 1000000 [--log path] [--save out.json]
+#        [--baseline old.json] [--legacy]
+# With --baseline the run exits with status 1 if any stage got more than --tolerance slower.
+
+MIN_COMPARED_SECONDS = 0.05
+
+
+def measure(function, *args, repeat=1, trace_memory=True):
+    # Best of `repeat` untraced runs, then one more under tracemalloc for the peak allocation
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        run_time = time.perf_counter() - start
+        elapsed = run_time if elapsed is None else min(elapsed, run_time)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def read_log(file_path):
+    with open(file_path, 'rb') as file:
+        return len(file.read())
+
+
+def parse_log_lines(file_path):
+    return list(iter_transactions(file_path))
+
+
+def aggregate_store(transactions):
+    return TransactionStore().add_all(transactions)
+
+
+def aggregate_summary(transactions):
+    return TransactionSummary().add_all(transactions)
+
+
+def rank_all(store, item_limit=5, player_limit=5):
+    # What the upload job computes for the results page and the Excel file
+    store.rankings.clear()
+    return {
+        "most_sold_items": engine.find_most_sold_items_per_day(store, True, item_limit),
+        "most_bought_items": engine.find_most_bought_items_per_day(store, True, item_limit),
+        "buy_players_per_day": engine.find_most_buy_players_per_day(store, player_limit),
+        "sell_players_per_day": engine.find_most_sell_players_per_day(store, player_limit),
+    }
+
+
+def export_excel(file_path, results):
+    sheet_data = {
+        "Most Buy Players per Day": results["buy_players_per_day"],
+        "Most Sell Players per Day": results["sell_players_per_day"],
+    }
+    create_excel_file(file_path, sheet_data, results["most_sold_items"], results["most_bought_items"])
+
+
+def render_results(results):
+    # The results page of a finished job: the summary and the first page of every table
+    with app.app.test_request_context():
+        return len(app.render_results(app.table_rows(results), job_id="benchmark"))
+
+
+def legacy_pipeline(log_path, excel_path):
+    # test.py re-reads the log for every table, this is the whole script end to end
+    sold = legacy.find_most_sold_items_per_day(log_path)
+    bought = legacy.find_most_bought_items_per_day(log_path)
+    sheet_data = {
+        "Most Buy Players per Day": legacy.find_most_buy_players_per_day(log_path, player_limit=5),
+        "Most Sell Players per Day": legacy.find_most_sell_players_per_day(log_path, player_limit=5),
+    }
+    legacy.create_excel_file(excel_path, sheet_data, sold, bought, item_limit=5)
+
+
+def run(log_path, output_dir, include_legacy=False, repeat=1, trace_memory=True):
+    size = os.path.getsize(log_path)
+    stages = {}
+
+    def stage(name, function, *args, per_line=False):
+        result, elapsed, peak = measure(function, *args, repeat=repeat, trace_memory=trace_memory)
+        stages[name] = {"seconds": elapsed, "peak_bytes": peak,
+                        "mb_per_second": size / 1024 / 1024 / elapsed if elapsed and per_line else None}
+        return result
+
+    stage("read", read_log, log_path, per_line=True)
+    transactions = stage("parse", parse_log_lines, log_path, per_line=True)
+    store = stage("aggregate_store", aggregate_store, transactions, per_line=True)
+    stage("aggregate_summary", aggregate_summary, transactions, per_line=True)
+    results = stage("rank", rank_all, store)
+    stage("excel_export", export_excel, os.path.join(output_dir, "pipeline.xlsx"), results)
+    stage("html_render", render_results, results)
+    if include_legacy:
+        stage("legacy_test_py", legacy_pipeline, log_path, os.path.join(output_dir, "legacy.xlsx"), per_line=True)
+
+    for values in stages.values():
+        if values["mb_per_second"] is not None:
+            values["lines_per_second"] = len(transactions) / values["seconds"]
+    return {"log": log_path, "bytes": size, "lines": len(transactions), "stages": stages}
+
+
+def compare(report, baseline, tolerance):
+    # Returns the stages that are more than tolerance (a fraction) slower than the baseline.
+    # Stages that take only a few milliseconds are reported but too noisy to fail on.
+    regressions = []
+    for name, values in report["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None:
+            continue
+        change = values["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        print(f"{name:>18}: {old['seconds']:8.3f} s -> {values['seconds']:8.3f} s  ({change:+.0%})")
+        if change > tolerance and values["seconds"] > MIN_COMPARED_SECONDS:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the log processing pipeline.")
+    parser.add_argument("--lines", type=int, default=200000, help="size of the generated log")
+    parser.add_argument("--log", help="benchmark this log instead of a generated one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--legacy", action="store_true", help="also time the test.py pipeline")
+    parser.add_argument("--repeat", type=int, default=3, help="report the fastest of this many runs per stage")
+    parser.add_argument("--no-memory", action="store_true", help="skip the extra tracemalloc run per stage")
+    parser.add_argument("--save", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    log_path = args.log
+    if log_path is None:
+        log_path = os.path.join(output_dir, "transaction-log.txt")
+        write_log(log_path, args.lines, args.seed)
+
+    report = run(log_path, output_dir, args.legacy, args.repeat, not args.no_memory)
+
+    print(f"{report['lines']:,} lines, {report['bytes'] / 1024 / 1024:,.1f} MiB")
+    for name, values in report["stages"].items():
+        line = f"{name:>18}: {values['seconds']:8.3f} s"
+        if values["mb_per_second"] is not None:
+            line += f"  {values['mb_per_second']:8.1f} MiB/s  {values['lines_per_second']:12,.0f} lines/s"
+        if values["peak_bytes"] is not None:
+            line += f"  peak {values['peak_bytes'] / 1024 / 1024:8.1f} MiB"
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        if regressions:
+            print("Slower than the baseline:", ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
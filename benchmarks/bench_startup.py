@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import compare
+
+# Cold start of the web app: each run is a fresh interpreter that imports the engine on its
+# own, then the app, then serves the index page, the way a restarted worker would.
+# Usage: python benchmarks/bench_startup.py [--repeat 10] [--imports 15] [--save out.json]
+#        [--baseline old.json]
+# --imports lists the slowest imports (python -X importtime) behind `import app`.
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import engine
+engine_imported = time.perf_counter()
+import app
+app_imported = time.perf_counter()
+status = app.app.test_client().get('/').status_code
+served = time.perf_counter()
+print(json.dumps({
+    "import_engine": engine_imported - start,
+    "import_app": app_imported - engine_imported,
+    "first_request": served - app_imported,
+    "status": status,
+    "openpyxl_loaded": "openpyxl" in sys.modules,
+}))
+"""
+
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def cold_start():
+    # One fresh interpreter; its own timings plus the wall time of the whole process
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", COLD_START], cwd=PACKAGE_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    timings = json.loads(output.splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+def slowest_imports(count):
+    # (cumulative seconds, module) for the top level imports of `import app`, slowest first
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=PACKAGE_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    imports = []
+    for match in IMPORT_TIME.finditer(stderr):
+        _, cumulative, indent, module = match.groups()
+        if len(indent) <= 2:
+            imports.append((int(cumulative) / 1e6, module))
+    return sorted(imports, reverse=True)[:count]
+
+
+def run(repeat):
+    runs = [cold_start() for _ in range(repeat)]
+    stages = {}
+    for name in ("import_engine", "import_app", "first_request", "process"):
+        stages[name] = {"seconds": min(timings[name] for timings in runs),
+                        "median_seconds": sorted(timings[name] for timings in runs)[len(runs) // 2]}
+    return {"repeat": repeat, "stages": stages,
+            "openpyxl_loaded": any(timings["openpyxl_loaded"] for timings in runs),
+            "status": runs[-1]["status"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a cold start of the web app up to its first request.")
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters to start")
+    parser.add_argument("--imports", type=int, default=0, help="also list this many of the slowest imports")
+    parser.add_argument("--save", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+
+    print(f"{args.repeat} cold starts, index page status {report['status']}")
+    for name, values in report["stages"].items():
+        print(f"{name:>18}: {values['seconds']:8.3f} s best  {values['median_seconds']:8.3f} s median")
+    print("openpyxl imported before the first export:", "yes" if report["openpyxl_loaded"] else "no")
+
+    if args.imports:
+        print("Slowest imports behind `import app`:")
+        for seconds, module in slowest_imports(args.imports):
+            print(f"{module:>30}: {seconds:8.3f} s")
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        if regressions:
+            print("Slower than the baseline:", ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
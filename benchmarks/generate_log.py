@@ -0,0 +1,157 @@
+import argparse
+import bisect
+import itertools
+import os
+import random
+from datetime import datetime, timedelta
+
+# Writes a synthetic EconomyShopGUI transaction log of any size for the benchmarks.
+# Players and items follow a Zipf-like distribution (a few whales and best sellers,
+# a long tail), like the real log in uploads/transaction-log.txt.
+# Usage: python benchmarks/generate_log.py output.log 1000000 [--seed 1] [--crlf]
+
+# (name, id, unit price in dollars) taken from the sample log; more items are made up from --items
+CATALOG = [
+    ("Hay Block", "Blocks.3", 26.0), ("Rotten Flesh", "Mobs.15", 0.5), ("Name Tag", "Miscellaneous.21", 900.0),
+    ("String", "Mobs.14", 1.2), ("Bone", "Mobs.4", 1.2), ("Spider Eye", "Mobs.13", 2.0),
+    ("Ender Pearl", "Mobs.5", 1.9), ("Experience Bottle", "Miscellaneous.11", 150.0),
+    ("Copper Ingot", "Ores.7", 1.0), ("Red Mushroom", "Farming.24", 3.0), ("Carrot", "Farming.8", 0.4),
+    ("Crimson Stem", "Blocks.184", 6.0), ("End Stone", "Blocks.108", 4.0), ("Baked Potato", "Food.10", 0.6),
+    ("Quartz", "Ores.21", 8.0), ("Oxidized Copper", "Blocks.72", 12.0), ("Bamboo Mosaic", "Blocks.24", 5.0),
+    ("Bamboo Block", "Blocks.19", 3.0), ("Crimson Hyphae", "Blocks.180", 6.0), ("Gold Ingot", "Ores.14", 12.0),
+    ("Pitcher Pod", "Farming.20", 40.0), ("Melon", "Farming.16", 0.8), ("Coal", "Ores.4", 2.5),
+    ("Iron Ingot", "Ores.16", 6.0), ("Pumpkin", "Farming.22", 1.5), ("Diamond", "Ores.9", 120.0),
+    ("Saddle", "Miscellaneous.26", 250.0), ("Honeycomb", "Farming.3", 4.0), ("Emerald", "Ores.11", 60.0),
+    ("Wheat", "Farming.28", 0.6), ("Sugar Cane", "Farming.25", 0.7), ("Potato", "Farming.21", 0.4),
+    ("Cactus", "Farming.7", 0.9), ("Redstone", "Ores.23", 1.8), ("Netherite Ingot", "Ores.20", 407.0),
+    ("Stone", "Blocks.11", 0.8), ("Glowstone", "Blocks.14", 5.0), ("Oak Log", "Blocks.206", 2.0),
+    ("Sand", "Blocks.150", 0.6), ("Packed Ice", "Blocks.6", 9.0), ("Honey Bottle", "Food.9", 10.0),
+    ("Cooked Rabbit", "Food.15", 1.1), ("Golden Horse Armor", "Miscellaneous.29", 300.0),
+    ("Dragon Head", "Miscellaneous.56", 26500.0), ("Sculk Catalyst", "Miscellaneous.61", 95.0),
+]
+# Items that can only be bought, priced in levels
+LEVEL_ITEMS = [("Custom Enchant Key", "Keys.2", 35.0), ("Rare Crate Key", "Keys.3", 120.0)]
+
+# Rank prefixes shown before some player names, including the glyphs chat plugins use
+RANKS = ["Emarald", "Platinum", "Gold", "[VIP]", "ꑂ", "⚔", "✦MVP"]
+
+# (screen, action, share of lines)
+SCREENS = [
+    ("buy screen", "bought", 0.40),
+    ("buy stacks screen", "bought", 0.22),
+    ("sell screen", "sold", 0.17),
+    ("sell gui", "sold", 0.11),
+    ("quick sell screen", "sold", 0.10),
+]
+
+
+def zipf_weights(count, exponent=1.1):
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def make_players(rng, count):
+    players = []
+    for index in range(count):
+        name = f"{rng.choice(['', '_', 'x'])}{rng.choice(['Steve', 'Alex', 'Kotako', 'Neko', 'Honeybear', 'Max'])}"
+        players.append((f"{name}{index}", rng.choice(RANKS) if rng.random() < 0.3 else None))
+    return players
+
+
+def make_items(rng, count):
+    items = list(CATALOG[:count])
+    for index in range(len(items), count):
+        items.append((f"Block Variant {index}", f"Blocks.{300 + index}", round(rng.uniform(0.2, 50.0), 2)))
+    return items
+
+
+def generate_lines(count, seed=1, players=500, items=120, lines_per_day=20000, start=datetime(2023, 7, 11)):
+    # Yields count log lines (without line endings) in timestamp order
+    rng = random.Random(seed)
+    players = make_players(rng, players)
+    items = make_items(rng, items)
+    player_weights = zipf_weights(len(players))
+    item_weights = zipf_weights(len(items))
+    screen_weights = list(itertools.accumulate(share for _, _, share in SCREENS))
+    mean_gap = 86400 / lines_per_day
+
+    def pick(values, weights):
+        return values[bisect.bisect_left(weights, rng.random() * weights[-1])]
+
+    clock = start
+    produced = 0
+    while produced < count:
+        clock += timedelta(seconds=rng.expovariate(1 / mean_gap))
+        stamp = clock.strftime("%Y-%m-%d %H:%M:%S")
+        player, rank = pick(players, player_weights)
+        who = f"{rank} {player}" if rank else player
+        screen, action, _ = pick(SCREENS, screen_weights)
+
+        if screen == "buy screen" and rng.random() < 0.02:
+            name, item_id, price = rng.choice(LEVEL_ITEMS)
+            quantity = rng.randint(1, 3)
+            lines = [f"[{stamp}] - {who} bought {quantity} x {name}({item_id}) for {price * quantity:.2f} levels "
+                     f"with the buy screen."]
+        elif screen == "buy stacks screen":
+            # A stack purchase logs one line per stack in the same second, the price creeping up
+            name, item_id, price = pick(items, item_weights)
+            total = price * 64 * rng.uniform(0.9, 1.3)
+            lines = []
+            for _ in range(rng.randint(1, 8)):
+                total *= 1.04
+                lines.append(f"[{stamp}] - {who} bought 64 x {name}({item_id}) for ${total:,.2f} "
+                             f"with the buy stacks screen.")
+        elif screen == "sell gui":
+            # The sell GUI sells everything in the window at once, "Nx Name(Id), ..."
+            sold = {}
+            for _ in range(rng.choice((1, 1, 1, 2, 2, 3, 5))):
+                item = pick(items, item_weights)
+                sold[item] = sold.get(item, 0) + rng.randint(1, 640)
+            total = sum(price * quantity for (_, _, price), quantity in sold.items()) * rng.uniform(0.4, 0.6)
+            listed = ", ".join(f"{quantity}x {name}({item_id})" for (name, item_id, _), quantity in sold.items())
+            lines = [f"[{stamp}] - {who} sold {listed} for ${total:,.2f} with the sell gui."]
+        else:
+            name, item_id, price = pick(items, item_weights)
+            if action == "bought":
+                quantity = rng.choice((1, 1, 2, 8, 16, 32, 64))
+                ratio = rng.uniform(0.9, 1.1)
+            else:
+                quantity = rng.choice((1, 16, 32, 64, 64, 128, 640, 1280, 2304))
+                ratio = rng.uniform(0.4, 0.6)
+            lines = [f"[{stamp}] - {who} {action} {quantity} x {name}({item_id}) for ${price * quantity * ratio:,.2f} "
+                     f"with the {screen}."]
+
+        for line in lines[:count - produced]:
+            yield line
+        produced += len(lines)
+
+
+def write_log(file_path, count, seed=1, line_ending="\n", **options):
+    with open(file_path, 'w', encoding='utf-8', newline='') as file:
+        batch = []
+        for line in generate_lines(count, seed, **options):
+            batch.append(line + line_ending)
+            if len(batch) == 10000:
+                file.writelines(batch)
+                batch.clear()
+        file.writelines(batch)
+    return os.path.getsize(file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic EconomyShopGUI transaction log.")
+    parser.add_argument("output")
+    parser.add_argument("lines", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--items", type=int, default=120)
+    parser.add_argument("--lines-per-day", type=int, default=20000)
+    parser.add_argument("--crlf", action="store_true", help="end lines with \\r\\n like logs copied from Windows")
+    args = parser.parse_args()
+
+    size = write_log(args.output, args.lines, args.seed, "\r\n" if args.crlf else "\n", players=args.players,
+                     items=args.items, lines_per_day=args.lines_per_day)
+    print(f"Wrote {args.lines:,} lines ({size / 1024 / 1024:,.1f} MiB) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
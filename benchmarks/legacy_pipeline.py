@@ -1,3 +1,6 @@
+# The functions of the original test.py script, kept unchanged as the baseline that
+# bench_pipeline.py --legacy measures. Use batch.py to process logs from the command line.
+
 import os
 import re
 from collections import defaultdict
@@ -222,42 +225,3 @@ def extract_item_name(item_info):
 
     item_name = "x".join(item_parts[1:]).strip().split("for")[0].strip()
     return item_name
-
-
-def main():
-    # Get the path of the script's directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Log file path (assuming it's in the same directory as the script)
-    log_file = os.path.join(script_dir, "transaction-log.txt")
-
-    # Output directory path
-    output_dir = os.path.join(script_dir, "output")
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Output Excel file path
-    excel_file = os.path.join(output_dir, "transaction_summary.xlsx")
-
-    include_item_id = True  # Set this to False to remove item ID from the result
-    item_limit = 5  # Set the desired limit for most sold/bought items (None for no limit)
-
-    most_sold_items = find_most_sold_items_per_day(log_file, include_id=include_item_id)
-    most_bought_items = find_most_bought_items_per_day(log_file, include_id=include_item_id)
-    most_sold_items_limited = {date: items[:item_limit] if item_limit else items for date, items in
-                               most_sold_items.items()}
-    most_bought_items_limited = {date: items[:item_limit] if item_limit else items for date, items in
-                                most_bought_items.items()}
-
-    buy_players_per_day = find_most_buy_players_per_day(log_file, player_limit=5)
-    sell_players_per_day = find_most_sell_players_per_day(log_file, player_limit=5)
-
-    sheet_data = {
-        "Most Buy Players per Day": buy_players_per_day,
-        "Most Sell Players per Day": sell_players_per_day
-    }
-
-    create_excel_file(excel_file, sheet_data, most_sold_items_limited, most_bought_items_limited, item_limit=item_limit)
-
-
-if __name__ == "__main__":
-    main()
@@ -0,0 +1,51 @@
+import os
+
+from transaction_parser import SOLD, BOUGHT, LINES, MONEY, format_item
+from transaction_store import load_store
+
+# The parsing and ranking engine behind the web app, importable on its own (scripts, the
+# batch tools, benchmarks) without Flask. Excel support lives in excel_export.py and only
+# loads openpyxl when a workbook is actually written.
+
+
+def load_transactions(source):
+    # Accept either a log file path or anything with rank_players/rank_items: parsed
+    # transactions, or a Warehouse (query)
+    if isinstance(source, (str, os.PathLike)):
+        return load_store(source)
+    return source
+
+
+def format_ranked_items(ranked_items, include_id=True, weight=LINES):
+    if weight == MONEY:
+        return {date: [f"{format_item(name, item_id, include_id)} ${total:,.2f}" for (name, item_id), total in items]
+                for date, items in ranked_items.items()}
+    return {date: [f"{format_item(name, item_id, include_id)}x{count}" for (name, item_id), count in items]
+            for date, items in ranked_items.items()}
+
+
+def find_most_sell_players_per_day(source, player_limit=None):
+    return load_transactions(source).rank_players(SOLD, player_limit)
+
+
+def find_most_buy_players_per_day(source, player_limit=None):
+    return load_transactions(source).rank_players(BOUGHT, player_limit)
+
+
+def find_most_sold_items_per_day(source, include_id=True, item_limit=None, weight=LINES):
+    # weight: LINES counts transactions, UNITS sums quantities, MONEY sums dollars
+    return format_ranked_items(load_transactions(source).rank_items(SOLD, item_limit, weight), include_id, weight)
+
+
+def find_most_bought_items_per_day(source, include_id=True, item_limit=None, weight=LINES):
+    return format_ranked_items(load_transactions(source).rank_items(BOUGHT, item_limit, weight), include_id, weight)
+
+
+def rank_results(summary, item_limit, player_limit, include_item_id, weight):
+    # Rankings are cut to the limits once, only the top entries are ever formatted
+    return {
+        "most_sold_items": find_most_sold_items_per_day(summary, include_item_id, item_limit, weight),
+        "most_bought_items": find_most_bought_items_per_day(summary, include_item_id, item_limit, weight),
+        "buy_players_per_day": find_most_buy_players_per_day(summary, player_limit=player_limit),
+        "sell_players_per_day": find_most_sell_players_per_day(summary, player_limit=player_limit),
+    }
@@ -0,0 +1,77 @@
+import os
+import tempfile
+from functools import partial
+
+# openpyxl takes a noticeable part of a second to import, so it is only loaded once a
+# workbook is actually written rather than whenever the app starts
+
+
+def player_rows(day_data):
+    # One row per date: Date, Player, Amount, Player, Amount, ...
+    for date, players in day_data.items():
+        row = [date]
+        for player, amount in players:
+            row.append(player)
+            row.append(amount)
+        yield row
+
+
+def item_rows(items_per_day, item_limit=None):
+    for date, items in items_per_day.items():
+        if item_limit:
+            items = items[:item_limit]
+        yield [date, *items]
+
+
+def write_sheet(wb, title, header, rows):
+    # Column widths must be set before the first row is streamed. rows() returns a fresh
+    # row generator over the in-memory rankings, so one pass measures the widths and a
+    # second one writes the rows, without holding the whole table as lists.
+    from openpyxl.utils import get_column_letter
+
+    sheet = wb.create_sheet(title=title)
+    widths = []
+    for row in rows():
+        for index, value in enumerate(row):
+            length = len(str(value))
+            if index == len(widths):
+                widths.append(length)
+            elif length > widths[index]:
+                widths[index] = length
+
+    for index, width in enumerate(widths, start=1):
+        sheet.column_dimensions[get_column_letter(index)].width = (width + 2) * 1.2
+
+    sheet.append(header)
+    for row in rows():
+        sheet.append(row)
+
+
+def create_excel_file(file_path, sheet_data, most_sold_items=None, most_bought_items=None, item_limit=None,
+                      player_limit=None):
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows straight to the xlsx file instead of keeping cell objects
+    wb = Workbook(write_only=True)
+
+    for sheet_name, day_data in sheet_data.items():
+        write_sheet(wb, sheet_name, ["Date", "Player", "Amount"], partial(player_rows, day_data))
+
+    if most_sold_items:
+        write_sheet(wb, "Most Sold Items", ["Date", "Most Sold Items"], partial(item_rows, most_sold_items, item_limit))
+
+    if most_bought_items:
+        write_sheet(wb, "Most Bought Items", ["Date", "Most Bought Items"],
+                    partial(item_rows, most_bought_items, item_limit))
+
+    # Save next to the target and rename, so a reader never sees a half-written file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", suffix=".xlsx.tmp")
+    os.close(fd)
+    try:
+        wb.save(temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    print(f"Excel file saved successfully at: {file_path}")
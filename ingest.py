@@ -0,0 +1,140 @@
+import hashlib
+import os
+import queue
+import tempfile
+
+from transaction_cache import CHUNK_SIZE, open_log_stream
+from transaction_parser import scan_transactions
+from transaction_store import TransactionStore
+
+# Chunks waiting between the request thread and the parsing job; with CHUNK_SIZE reads
+# this caps the memory held for one upload at about 64 MiB
+MAX_QUEUED_CHUNKS = 64
+
+
+class ChunkPipe:
+    # Hands the chunks read on the request thread to the job parsing them, so receiving and
+    # parsing overlap. The queue is bounded: a slow parser holds the upload back instead of
+    # buffering all of it in memory.
+
+    def __init__(self, max_chunks=MAX_QUEUED_CHUNKS, progress=None):
+        self.progress = progress
+        self.bytes_received = 0
+        self.bytes_read = 0
+        self.abandoned = False
+        self._queue = queue.Queue(max_chunks)
+        self._chunk = b""
+        self._offset = 0
+        self._finished = False
+
+    def pump(self, stream):
+        # Request side: copy stream into the pipe until it ends or the reader gives up
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                self.bytes_received += len(chunk)
+                if not self._put(chunk):
+                    return
+        except BaseException as error:
+            self._put(error)
+            raise
+        self._put(None)
+
+    def _put(self, item):
+        while not self.abandoned:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read(self, size=-1):
+        # Reader side: up to size bytes of the current chunk, b"" once the upload has ended
+        if self._offset == len(self._chunk):
+            self._chunk = self._next_chunk()
+            self._offset = 0
+        if size is None or size < 0:
+            size = len(self._chunk)
+        data = self._chunk[self._offset:self._offset + size]
+        self._offset += len(data)
+        return bytes(data)
+
+    def _next_chunk(self):
+        if self._finished:
+            return b""
+        item = self._queue.get()
+        if item is None:
+            self._finished = True
+            return b""
+        if isinstance(item, BaseException):
+            self._finished = True
+            raise OSError("The upload was interrupted") from item
+        self.bytes_read += len(item)
+        if self.progress is not None:
+            self.progress(self.bytes_read)
+        return memoryview(item)
+
+    def close(self):
+        # Reader side: stop the request thread from waiting on a parser that has given up
+        self.abandoned = True
+
+
+class StreamParser:
+    # Parses a log that arrives in arbitrary chunks into a TransactionStore and hashes it on
+    # the way, optionally writing the raw log out as well
+
+    def __init__(self, raw_file=None):
+        self.store = TransactionStore()
+        self.raw_file = raw_file
+        self._digest = hashlib.sha256()
+        self._partial = b""
+
+    def feed(self, chunk):
+        self._digest.update(chunk)
+        if self.raw_file is not None:
+            self.raw_file.write(chunk)
+        data = self._partial + chunk
+        # Keep an unfinished last line until the rest of it arrives
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        self.store.add_all(scan_transactions(data, 0, end))
+
+    def close(self):
+        if self._partial:
+            self.store.add_all(scan_transactions(self._partial))
+            self._partial = b""
+        return self.store
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def ingest_stream(stream, upload_folder, keep_raw=False):
+    # Parse an upload (plain or gzip) straight from stream. Returns the store, the log's
+    # sha256 digest and, with keep_raw, the path of the log saved as <digest>.log.
+    log_stream = open_log_stream(stream)
+    raw_file = None
+    temp_path = None
+    if keep_raw:
+        fd, temp_path = tempfile.mkstemp(dir=upload_folder, suffix=".upload")
+        raw_file = os.fdopen(fd, 'wb')
+
+    try:
+        parser = StreamParser(raw_file)
+        for chunk in iter(lambda: log_stream.read(CHUNK_SIZE), b""):
+            parser.feed(chunk)
+        store = parser.close()
+        digest = parser.hexdigest()
+
+        log_file_path = None
+        if raw_file is not None:
+            raw_file.close()
+            log_file_path = os.path.join(upload_folder, digest + ".log")
+            os.replace(temp_path, log_file_path)
+    except BaseException:
+        if raw_file is not None:
+            raw_file.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    return store, digest, log_file_path
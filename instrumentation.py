@@ -0,0 +1,122 @@
+import cProfile
+import threading
+import time
+import tracemalloc
+
+# Opt-in stage timing for the upload pipeline. With metrics switched off, stage() hands
+# back one shared object whose methods do nothing, so instrumented code pays about a call.
+
+STAGE_FIELDS = (
+    ("runs", "counter", "Times each upload stage ran"),
+    ("seconds", "counter", "Wall time spent in each upload stage"),
+    ("lines", "counter", "Log lines handled by each upload stage"),
+    ("bytes", "counter", "Bytes handled by each upload stage"),
+    ("peak_alloc_bytes", "gauge", "Largest Python allocation peak seen in each upload stage"),
+)
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, lines=0, bytes=0):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+
+    def __init__(self, metrics, name, record):
+        self.metrics = metrics
+        self.name = name
+        self.record = record
+        self.lines = 0
+        self.bytes = 0
+
+    def __enter__(self):
+        if self.metrics.trace_memory:
+            # The peak is process wide, with several jobs running at once it is an upper bound
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        peak = 0
+        if self.metrics.trace_memory:
+            peak = max(0, tracemalloc.get_traced_memory()[1] - self.memory_start)
+        self.metrics.observe(self.name, seconds, self.lines, self.bytes, peak)
+        if self.record is not None:
+            self.record[self.name] = round(seconds, 6)
+        return False
+
+    def count(self, lines=0, bytes=0):
+        self.lines += lines
+        self.bytes += bytes
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name, record=None):
+        # Use as `with metrics.stage("parse") as stage: ...; stage.count(lines=..., bytes=...)`.
+        # record, if given, is a dict that also receives {name: seconds} for this one run.
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name, record)
+
+    def observe(self, name, seconds, lines=0, bytes=0, peak_alloc_bytes=0):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = dict.fromkeys((field for field, _, _ in STAGE_FIELDS), 0)
+            stage["runs"] += 1
+            stage["seconds"] += seconds
+            stage["lines"] += lines
+            stage["bytes"] += bytes
+            stage["peak_alloc_bytes"] = max(stage["peak_alloc_bytes"], peak_alloc_bytes)
+
+    def prometheus_text(self):
+        # Prometheus text exposition format, one family per field labelled by stage
+        with self._lock:
+            stages = {name: dict(values) for name, values in self._stages.items()}
+
+        lines = []
+        for field, kind, description in STAGE_FIELDS:
+            metric = f"upload_stage_{field}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {metric} {description}.")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, values in stages.items():
+                lines.append(f'{metric}{{stage="{name}"}} {values[field]}')
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the app and its upload jobs
+metrics = Metrics()
+
+
+def profile_call(file_path, function, *args):
+    # Run function under cProfile and write the stats to file_path (read with pstats or snakeviz)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args)
+    finally:
+        profiler.dump_stats(file_path)
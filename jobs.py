@@ -0,0 +1,93 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_JOB_WORKERS = 4
+MAX_FINISHED_JOBS = 200
+
+
+class Job:
+    # One background upload: progress is bytes parsed out of bytes_total
+
+    def __init__(self, job_id, bytes_total):
+        self.id = job_id
+        self.status = QUEUED
+        self.bytes_total = bytes_total
+        self.bytes_parsed = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        # Seconds per pipeline stage, filled in when metrics are switched on
+        self.stages = {}
+
+    def update_progress(self, bytes_parsed):
+        self.bytes_parsed = min(bytes_parsed, self.bytes_total)
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "bytes_parsed": self.bytes_parsed,
+            "bytes_total": self.bytes_total,
+            "progress": self.bytes_parsed / self.bytes_total if self.bytes_total else 1.0,
+            "error": self.error,
+            "stages": self.stages,
+        }
+
+
+class JobQueue:
+    # Runs jobs on a pool of worker threads so requests return immediately.
+    # Finished jobs are kept (oldest dropped first) so their results can still be fetched.
+
+    def __init__(self, workers=DEFAULT_JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, bytes_total, function, *args, dedicated=False):
+        # function is called as function(job, *args) and its return value becomes job.result.
+        # A dedicated job gets a thread of its own and starts at once even when every pool
+        # worker is busy; streamed uploads need that, the request thread feeds them directly.
+        job = Job(uuid.uuid4().hex, bytes_total)
+        with self._lock:
+            self._jobs[job.id] = job
+        if dedicated:
+            threading.Thread(target=self._run, args=(job, function, args), name="upload-stream", daemon=True).start()
+        else:
+            self._executor.submit(self._run, job, function, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, function, args):
+        job.status = RUNNING
+        try:
+            job.result = function(job, *args)
+            job.bytes_parsed = job.bytes_total
+            job.status = DONE
+        except Exception as error:
+            job.error = str(error)
+            job.status = FAILED
+        job.finished = time.time()
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.done]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
@@ -0,0 +1,130 @@
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+
+from transaction_parser import TransactionSummary, scan_transactions
+
+CHUNK_SIZE = 1024 * 1024
+# Writing the state serialises the whole summary, so it is saved at most this often (seconds).
+# After a crash the log is re-read from the saved offset, nothing is counted twice.
+DEFAULT_SAVE_INTERVAL = 30
+
+
+class LogFollower:
+    # Follows a live transaction log and folds only the newly appended lines into a summary.
+    # The byte offset and inode are remembered so a rotated or truncated log is picked up
+    # from its start, and the rest of the rotated file is read before switching over.
+
+    def __init__(self, file_path, state_path=None, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.file_path = file_path
+        self.state_path = state_path
+        self.save_interval = save_interval
+        self.inode = None
+        self.offset = 0
+        self.partial = b""
+        self.summary = TransactionSummary()
+        self._file = None
+        self._lock = threading.Lock()
+        self._unsaved = False
+        self._saved_at = time.monotonic()
+
+        if state_path and os.path.exists(state_path):
+            self.load_state()
+
+    def poll(self):
+        # Returns the number of transactions added since the previous poll
+        with self._lock:
+            try:
+                stat = os.stat(self.file_path)
+            except FileNotFoundError:
+                # The log is being rotated, try again on the next poll
+                return 0
+
+            added = 0
+            if self._file is None:
+                self._open(stat)
+            elif stat.st_ino != self.inode:
+                # Rotated: drain what was appended to the old file, then start on the new one
+                added += self._consume()
+                self._file.close()
+                self._open(stat, resume=False)
+            elif stat.st_size < self.offset:
+                # Truncated in place
+                self._file.seek(0)
+                self.offset = 0
+                self.partial = b""
+
+            offset = self.offset
+            added += self._consume()
+            if added or self.offset != offset:
+                self._unsaved = True
+            if self.state_path and self._unsaved and time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+            return added
+
+    def query(self, function, *args):
+        # function(summary, *args) with no poll changing the summary while it runs
+        with self._lock:
+            return function(self.summary, *args)
+
+    def close(self):
+        with self._lock:
+            if self.state_path and self._unsaved:
+                self._save()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _save(self):
+        self.save_state()
+        self._unsaved = False
+        self._saved_at = time.monotonic()
+
+    def _open(self, stat, resume=True):
+        self._file = open(self.file_path, 'rb')
+        if resume and stat.st_ino == self.inode and stat.st_size >= self.offset:
+            self._file.seek(self.offset)
+        else:
+            self.offset = 0
+            self.partial = b""
+        self.inode = stat.st_ino
+
+    def _consume(self):
+        added = 0
+        for chunk in iter(lambda: self._file.read(CHUNK_SIZE), b""):
+            self.offset += len(chunk)
+            data = self.partial + chunk
+            # Keep an unfinished last line until the rest of it is written
+            end = data.rfind(b"\n") + 1
+            self.partial = data[end:]
+            for transaction in scan_transactions(data, 0, end):
+                self.summary.add(transaction)
+                added += 1
+        return added
+
+    def save_state(self):
+        state = {
+            "file_path": self.file_path,
+            "inode": self.inode,
+            "offset": self.offset,
+            "partial": base64.b64encode(self.partial).decode("ascii"),
+            "summary": self.summary.to_dict(),
+        }
+        folder = os.path.dirname(self.state_path) or "."
+        fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, 'w') as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.state_path)
+
+    def load_state(self):
+        with open(self.state_path, 'r') as file:
+            state = json.load(file)
+        if state["file_path"] != self.file_path:
+            return
+        self.inode = state["inode"]
+        self.offset = state["offset"]
+        self.partial = base64.b64decode(state["partial"])
+        self.summary = TransactionSummary.from_dict(state["summary"])
@@ -0,0 +1,111 @@
+import glob
+import gzip
+import hashlib
+import heapq
+import os
+import re
+
+from transaction_cache import CHUNK_SIZE, GZIP_MAGIC
+from transaction_parser import TransactionSummary, iter_transactions, scan_transactions
+
+# Compression and rotation suffixes dropped from a file name to get its server name, e.g.
+# "survival-2023-07-11.log.gz", "survival.log.1" and "survival.txt" all belong to "survival"
+ROTATION_SUFFIX = re.compile(r"(?:\.gz|\.\d+|\.log|\.txt|[-_.]\d{4}-\d{2}-\d{2})+$")
+
+
+def server_name(file_name):
+    name = os.path.basename(file_name)
+    return ROTATION_SUFFIX.sub("", name) or name
+
+
+def expand_sources(patterns):
+    # Turn path patterns into (server, file path) sources. "survival=/srv/survival/logs/*"
+    # tags every match as survival; without "name=" the server comes from each file's name.
+    # A directory stands for every file in it.
+    sources = []
+    for pattern in patterns:
+        server, separator, path_pattern = pattern.partition("=")
+        if not separator:
+            server, path_pattern = None, pattern
+        for path in sorted(glob.glob(path_pattern)):
+            if os.path.isdir(path):
+                files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                               if os.path.isfile(os.path.join(path, name)))
+            else:
+                files = [path]
+            sources.extend((server or server_name(file_path), file_path) for file_path in files)
+    return sources
+
+
+def merged_digest(entries):
+    # Content address of a merged dataset from its (server, file digest) entries
+    digest = hashlib.sha256(b"merged")
+    for server, file_digest in entries:
+        digest.update(f"\0{server}={file_digest}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_gzip(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def iter_log_transactions(file_path, server=None, progress=None):
+    # Transactions of one log file in file order, tagged with server. Gzip rotations are
+    # decompressed as they are read. progress is called with the bytes of the file read so far.
+    if not is_gzip(file_path):
+        for transaction in iter_transactions(file_path, progress=progress):
+            yield transaction._replace(server=server)
+        return
+
+    with open(file_path, 'rb') as raw, gzip.GzipFile(fileobj=raw, mode='rb') as stream:
+        partial = b""
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            data = partial + chunk
+            # Keep an unfinished last line for the next chunk
+            end = data.rfind(b"\n") + 1
+            partial = data[end:]
+            for transaction in scan_transactions(data, 0, end):
+                yield transaction._replace(server=server)
+            if progress is not None:
+                progress(raw.tell())
+        for transaction in scan_transactions(partial):
+            yield transaction._replace(server=server)
+
+
+def _timestamp(transaction):
+    return transaction.date, transaction.time
+
+
+def merge_logs(sources, progress=None):
+    # Streaming k-way merge of time-ordered logs into one time-ordered stream. Only the next
+    # transaction of each file is held in memory; lines with the same timestamp keep the
+    # order of sources. progress is called with the bytes read over all files.
+    positions = [0] * len(sources)
+
+    def file_progress(index):
+        def update(position):
+            positions[index] = position
+            progress(sum(positions))
+        return update
+
+    return heapq.merge(*(iter_log_transactions(file_path, server, file_progress(index) if progress else None)
+                         for index, (server, file_path) in enumerate(sources)),
+                       key=_timestamp)
+
+
+def summarize_logs(sources, store=None, per_server=False, progress=None, summary_class=TransactionSummary):
+    # One pass over the merged logs: network wide totals in store (a TransactionStore or, by
+    # default, a summary_class) and, with per_server, a summary_class instance per server.
+    # summary_class can be sketches.SketchSummary to keep memory fixed on very long logs.
+    if store is None:
+        store = summary_class()
+    servers = {}
+    for transaction in merge_logs(sources, progress):
+        store.add(transaction)
+        if per_server:
+            summary = servers.get(transaction.server)
+            if summary is None:
+                summary = servers[transaction.server] = summary_class()
+            summary.add(transaction)
+    return store, servers
@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from transaction_parser import TransactionSummary, iter_transactions, parse_log
+
+# Below this many bytes per worker the process start-up costs more than it saves
+MIN_RANGE_BYTES = 4 * 1024 * 1024
+
+
+def split_ranges(file_path, parts):
+    # Cut the file into roughly equal byte ranges that all start at the beginning of a line
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as file:
+        for part in range(1, parts):
+            position = max(size * part // parts, boundaries[-1])
+            if position > 0:
+                file.seek(position - 1)
+                file.readline()
+            boundaries.append(min(file.tell(), size))
+    boundaries.append(size)
+
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def parse_range(file_path, start, end):
+    return TransactionSummary().add_all(iter_transactions(file_path, start, end))
+
+
+def _parse_range(task):
+    return parse_range(*task)
+
+
+def parse_log_parallel(file_path, workers=None, progress=None):
+    # Parse newline-aligned byte ranges in a process pool and merge the partial summaries
+    # in file order, so the result is identical to parse_log(file_path).
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, max(1, os.path.getsize(file_path) // MIN_RANGE_BYTES))
+    if workers <= 1:
+        return parse_log(file_path, progress)
+
+    tasks = [(file_path, start, end) for start, end in split_ranges(file_path, workers)]
+    summary = TransactionSummary()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (_, _, end), partial_summary in zip(tasks, pool.map(_parse_range, tasks)):
+            summary.merge(partial_summary)
+            if progress is not None:
+                progress(end)
+    return summary
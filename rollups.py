@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import date as Date
+from functools import partial
+
+from transaction_parser import top_k
+from transaction_store import ACTIONS, DOLLARS
+
+# Finest bucket kept in the cube; coarser ones are rolled up from it at query time
+HOUR = "hour"
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+GRANULARITIES = (HOUR, DAY, WEEK, MONTH)
+
+DIMENSIONS = ("action", "screen", "item", "player")
+
+# Measures stored in every cell
+TRANSACTIONS = 0
+UNITS = 1
+CENTS = 2
+MEASURES = {"transactions": TRANSACTIONS, "units": UNITS, "money": CENTS}
+
+_week_of_date = {}
+
+
+def _new_cell():
+    return [0, 0, 0]
+
+
+def bucket_of(hour, granularity):
+    # hour is "YYYY-MM-DD HH"
+    if granularity == HOUR:
+        return hour
+    if granularity == DAY:
+        return hour[:10]
+    if granularity == MONTH:
+        return hour[:7]
+    if granularity == WEEK:
+        day = hour[:10]
+        week = _week_of_date.get(day)
+        if week is None:
+            year, number, _ = Date.fromisoformat(day).isocalendar()
+            week = _week_of_date[day] = f"{year}-W{number:02d}"
+        return week
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+class RollupCube:
+    # Hour x action x screen x item x player cube of [transactions, units, cents], rolled up from a
+    # parsed TransactionStore the first time a query needs it (see store_cube).
+    # Money is split over the items of a line like the item rankings, so summing cells over items
+    # gives exact player totals. Transactions count per item, so a multi-item line counts once
+    # for each item it contains.
+
+    def __init__(self):
+        self.cells = defaultdict(_new_cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @classmethod
+    def from_store(cls, store):
+        # Build the cube from an already parsed TransactionStore (e.g. one loaded from the cache)
+        cube = cls()
+        dates = store.dates.values
+        items = store.items.values
+        players = store.players.values
+        screens = store.screens.values
+        for index, row in enumerate(store.item_row):
+            hour = f"{dates[store.day[row]]} {store.seconds[row] // 3600:02d}"
+            action = ACTIONS[store.action[row]]
+            cell = cube.cells[(hour, action, screens[store.screen[row]], items[store.item[index]],
+                               players[store.player[row]])]
+            cell[TRANSACTIONS] += 1
+            cell[UNITS] += store.quantity[index]
+            if store.currency[row] == DOLLARS:
+                cell[CENTS] += store.item_amount[index]
+        return cube
+
+    def query(self, granularity=DAY, group_by=("item",), action=None, screen=None, item=None, player=None,
+              start=None, end=None):
+        # Returns {bucket: {group key: [transactions, units, cents]}}. Group keys are tuples in the
+        # order of group_by; start and end filter on the bucket's date (inclusive, "YYYY-MM-DD").
+        positions = [DIMENSIONS.index(dimension) + 1 for dimension in group_by]
+        filters = [(DIMENSIONS.index(dimension) + 1, value)
+                   for dimension, value in (("action", action), ("screen", screen), ("item", item),
+                                            ("player", player))
+                   if value is not None]
+
+        result = defaultdict(partial(defaultdict, _new_cell))
+        for key, (transactions, units, cents) in self.cells.items():
+            if start is not None and key[0][:10] < start:
+                continue
+            if end is not None and key[0][:10] > end:
+                continue
+            if any(key[position] != value for position, value in filters):
+                continue
+            cell = result[bucket_of(key[0], granularity)][tuple(key[position] for position in positions)]
+            cell[TRANSACTIONS] += transactions
+            cell[UNITS] += units
+            cell[CENTS] += cents
+
+        return {bucket: dict(groups) for bucket, groups in sorted(result.items())}
+
+    def top(self, granularity=DAY, group_by=("item",), measure="units", limit=None, **filters):
+        # Top groups per bucket by one measure; money is reported in dollars and groups
+        # without any money (level purchases) are left out of money rankings
+        index = MEASURES[measure]
+        ranked = {}
+        for bucket, groups in self.query(granularity, group_by, **filters).items():
+            totals = {key[0] if len(key) == 1 else key: cell[index] for key, cell in groups.items()
+                      if index != CENTS or cell[CENTS]}
+            entries = top_k(totals, limit)
+            if index == CENTS:
+                entries = [(key, cents / 100) for key, cents in entries]
+            ranked[bucket] = entries
+        return ranked
+
+
+def store_cube(store):
+    # The store's cube, rolled up from its columns the first time it is needed
+    if store.cube is None:
+        store.cube = RollupCube.from_store(store)
+    return store.cube
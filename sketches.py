@@ -0,0 +1,261 @@
+import hashlib
+import math
+from array import array
+from functools import lru_cache
+
+from rollups import HOUR, DAY, GRANULARITIES, bucket_of
+from transaction_parser import LINES, UNITS, MONEY, item_amounts, top_k
+
+# Fixed-size approximate aggregates for logs too long to keep an exact counter per item and
+# player per day (TransactionSummary). Every (action, bucket) gets the same few sketches,
+# whatever the number of distinct items and players:
+#
+# - Count-Min sketches (width w, depth d) for item and player totals. An estimate never
+#   undercounts; with probability at least 1 - e^-d it overcounts by at most e/w of the
+#   bucket's total (all lines, units or cents of that action in that bucket). The defaults,
+#   w=512 and d=4, give 0.53% of the total with 98% probability.
+# - Heavy hitters: next to each Count-Min sketch the `capacity` keys with the largest
+#   estimates so far. Rankings come from these candidates, so a limit above capacity gets
+#   at most capacity entries, and keys far below the top can be missed.
+# - HyperLogLog (precision p, 2^p one-byte registers) for unique buyers and sellers, with a
+#   standard error of 1.04 / sqrt(2^p): 1.6% for the default p=12.
+#
+# With the defaults a bucket takes about 68 KiB per action. Sketches with the same sizes
+# merge exactly, so daily buckets roll up into weeks or months (rollup) and summaries of
+# separate logs or processes combine (merge) without going back to the lines.
+
+DEFAULT_WIDTH = 512
+DEFAULT_DEPTH = 4
+DEFAULT_CAPACITY = 64
+DEFAULT_PRECISION = 12
+
+
+@lru_cache(maxsize=1 << 16)
+def hash_key(key):
+    # Stable 64 bit hash (Python's hash() is salted per process, so sketches built in
+    # different processes would not merge). Items are (name, item_id) tuples. The cache
+    # is bounded, so memory stays fixed however many distinct players a log has.
+    if isinstance(key, tuple):
+        key = "\0".join(key)
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CountMinSketch:
+
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.counters = array('q', bytes(8 * width * depth))
+        self.total = 0
+
+    def _cells(self, hashed):
+        # Row i uses h1 + i * h2 (Kirsch-Mitzenmacher), two halves of one 64 bit hash
+        low = hashed & 0xFFFFFFFF
+        high = hashed >> 32 | 1
+        width = self.width
+        return [row * width + (low + row * high) % width for row in range(self.depth)]
+
+    def add(self, hashed, count=1):
+        # Returns the key's new estimate. Same cells as _cells, walked without building a list.
+        counters = self.counters
+        width = self.width
+        position = hashed & 0xFFFFFFFF
+        step = hashed >> 32 | 1
+        self.total += count
+        estimate = None
+        for offset in range(0, width * self.depth, width):
+            cell = offset + position % width
+            value = counters[cell] = counters[cell] + count
+            if estimate is None or value < estimate:
+                estimate = value
+            position += step
+        return estimate
+
+    def estimate(self, hashed):
+        counters = self.counters
+        return min(counters[cell] for cell in self._cells(hashed))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min sketches of different sizes cannot be merged")
+        self.counters = array('q', map(sum, zip(self.counters, other.counters)))
+        self.total += other.total
+        return self
+
+
+class HeavyHitters:
+    # A Count-Min sketch plus the keys with the `capacity` largest estimates seen so far
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.sketch = CountMinSketch(width, depth)
+        self.capacity = capacity
+        self.candidates = {}
+        self._floor = 0
+
+    def add(self, key, hashed, count=1):
+        estimate = self.sketch.add(hashed, count)
+        candidates = self.candidates
+        if key in candidates or len(candidates) < self.capacity:
+            candidates[key] = estimate
+        elif estimate > self._floor:
+            # _floor never exceeds the smallest candidate (candidates only grow), so below it
+            # there is nothing to do; above it, compare with the actual smallest candidate
+            smallest = min(candidates, key=candidates.get)
+            if estimate > candidates[smallest]:
+                del candidates[smallest]
+                candidates[key] = estimate
+                smallest = min(candidates, key=candidates.get)
+            self._floor = candidates[smallest]
+
+    def merge(self, other):
+        # Candidates of both sides, re-estimated against the merged sketch
+        self.sketch.merge(other.sketch)
+        keys = dict.fromkeys([*self.candidates, *other.candidates])
+        self.candidates = dict(top_k({key: self.sketch.estimate(hash_key(key)) for key in keys}, self.capacity))
+        self._floor = min(self.candidates.values()) if len(self.candidates) == self.capacity else 0
+        return self
+
+    def top(self, limit=None):
+        return top_k(self.candidates, limit)
+
+
+class HyperLogLog:
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, hashed):
+        # The first `precision` bits pick a register, which keeps the longest run of
+        # leading zeros (plus one) seen in the remaining bits
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        registers = self.registers
+        size = len(registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -rank for rank in registers)
+        zeros = registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            return round(size * math.log(size / zeros))
+        return round(estimate)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLogs of different precisions cannot be merged")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+
+class SketchBucket:
+    # Everything kept for one action in one bucket: player money, item lines/units/money and
+    # the distinct players
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH,
+                 precision=DEFAULT_PRECISION):
+        self.players = HeavyHitters(capacity, width, depth)
+        self.items = {weight: HeavyHitters(capacity, width, depth) for weight in (LINES, UNITS, MONEY)}
+        self.unique_players = HyperLogLog(precision)
+
+    def merge(self, other):
+        self.players.merge(other.players)
+        for weight, items in self.items.items():
+            items.merge(other.items[weight])
+        self.unique_players.merge(other.unique_players)
+        return self
+
+
+class SketchSummary:
+    # Approximate TransactionSummary: the same add/merge/rank_players/rank_items interface,
+    # in fixed memory per (action, bucket). Buckets are days unless granularity says otherwise
+    # (see rollups.GRANULARITIES); unique_players gives estimated distinct buyers or sellers.
+
+    def __init__(self, granularity=DAY, capacity=DEFAULT_CAPACITY, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH,
+                 precision=DEFAULT_PRECISION):
+        self.granularity = granularity
+        self.sizes = (capacity, width, depth, precision)
+        self.buckets = {}
+        self.line_count = 0
+
+    def _bucket(self, action, bucket):
+        per_bucket = self.buckets.get(action)
+        if per_bucket is None:
+            per_bucket = self.buckets[action] = {}
+        sketches = per_bucket.get(bucket)
+        if sketches is None:
+            sketches = per_bucket[bucket] = SketchBucket(*self.sizes)
+        return sketches
+
+    def add(self, transaction):
+        self.line_count += 1
+        date = transaction.date
+        if self.granularity != DAY:
+            date = bucket_of(f"{date} {transaction.time[:2]}", self.granularity)
+        sketches = self._bucket(transaction.action, date)
+
+        player_hash = hash_key(transaction.player)
+        sketches.unique_players.add(player_hash)
+        items = transaction.items
+        keys = [(item.name, item.item_id) for item in items]
+        hashes = [hash_key(key) for key in keys]
+        lines = sketches.items[LINES]
+        units = sketches.items[UNITS]
+        for item, key, item_hash in zip(items, keys, hashes):
+            lines.add(key, item_hash)
+            units.add(key, item_hash, item.quantity)
+
+        # Only money transactions count towards money totals, as in TransactionSummary
+        if transaction.currency == "$":
+            cents = round(transaction.price * 100)
+            sketches.players.add(transaction.player, player_hash, cents)
+            money = sketches.items[MONEY]
+            for key, item_hash, item_cents in zip(keys, hashes, item_amounts(cents, items)):
+                money.add(key, item_hash, item_cents)
+
+    def add_all(self, transactions):
+        for transaction in transactions:
+            self.add(transaction)
+        return self
+
+    def merge(self, other):
+        if (other.granularity, other.sizes) != (self.granularity, self.sizes):
+            raise ValueError("Only summaries with the same granularity and sketch sizes can be merged")
+        self.line_count += other.line_count
+        for action, per_bucket in other.buckets.items():
+            for bucket, sketches in per_bucket.items():
+                self._bucket(action, bucket).merge(sketches)
+        return self
+
+    def rollup(self, granularity):
+        # A new summary with these buckets merged into coarser ones, e.g. days into weeks
+        if granularity == self.granularity:
+            return self
+        # Only hours and days split cleanly into coarser buckets
+        coarser = GRANULARITIES.index(granularity) > GRANULARITIES.index(self.granularity)
+        if self.granularity not in (HOUR, DAY) or not coarser:
+            raise ValueError(f"Cannot roll {self.granularity} buckets up into {granularity} buckets")
+        summary = SketchSummary(granularity, *self.sizes)
+        summary.line_count = self.line_count
+        for action, per_bucket in self.buckets.items():
+            for bucket, sketches in per_bucket.items():
+                hour = bucket if self.granularity == HOUR else f"{bucket} 00"
+                summary._bucket(action, bucket_of(hour, granularity)).merge(sketches)
+        return summary
+
+    def rank_players(self, action, player_limit=None):
+        return {bucket: [(player, cents / 100) for player, cents in sketches.players.top(player_limit)]
+                for bucket, sketches in self.buckets.get(action, {}).items()}
+
+    def rank_items(self, action, item_limit=None, weight=LINES):
+        ranked = {bucket: sketches.items[weight].top(item_limit)
+                  for bucket, sketches in self.buckets.get(action, {}).items()}
+        if weight == MONEY:
+            return {bucket: [(item, cents / 100) for item, cents in items] for bucket, items in ranked.items()}
+        return ranked
+
+    def unique_players(self, action):
+        return {bucket: sketches.unique_players.count() for bucket, sketches in self.buckets.get(action, {}).items()}
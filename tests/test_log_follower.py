@@ -0,0 +1,86 @@
+import os
+
+from log_follower import LogFollower
+
+
+def line(second, player="Alex"):
+    return f"[2023-07-11 10:00:{second:02d}] - {player} bought 1 x Stone(Blocks.1) for $1.00 with the buy screen.\n"
+
+
+def append(path, text):
+    with open(path, 'a') as file:
+        file.write(text)
+
+
+def test_partial_line_waits_for_its_end(tmp_path):
+    log = str(tmp_path / "latest.log")
+    append(log, line(0) + line(1)[:30])
+    follower = LogFollower(log)
+    assert follower.poll() == 1
+    assert follower.summary.line_count == 1
+    append(log, line(1)[30:])
+    assert follower.poll() == 1
+    assert follower.summary.line_count == 2
+    follower.close()
+
+
+def test_rotation_by_rename(tmp_path):
+    log = str(tmp_path / "latest.log")
+    append(log, line(0))
+    follower = LogFollower(log)
+    follower.poll()
+    # Written to the old file after the last poll, then rotated away
+    append(log, line(1))
+    os.rename(log, str(tmp_path / "2023-07-11.log"))
+    assert follower.poll() == 0
+    append(log, line(2) + line(3))
+    assert follower.poll() == 3
+    assert follower.summary.line_count == 4
+    follower.close()
+
+
+def test_truncation_in_place(tmp_path):
+    log = str(tmp_path / "latest.log")
+    append(log, line(0) + line(1) + line(2))
+    follower = LogFollower(log)
+    follower.poll()
+    with open(log, 'w') as file:
+        file.write(line(3))
+    assert follower.poll() == 1
+    assert follower.summary.line_count == 4
+    follower.close()
+
+
+def test_restart_from_saved_state(tmp_path):
+    log = str(tmp_path / "latest.log")
+    state = str(tmp_path / "state.json")
+    append(log, line(0) + line(1) + line(2)[:20])
+    follower = LogFollower(log, state_path=state)
+    follower.poll()
+    follower.close()
+
+    # The offset, the unfinished line and the totals carry over
+    append(log, line(2)[20:] + line(3))
+    follower = LogFollower(log, state_path=state)
+    assert follower.summary.line_count == 2
+    assert follower.poll() == 2
+    assert follower.summary.line_count == 4
+    assert follower.summary.rank_players("bought") == {"2023-07-11": [("Alex", 4.0)]}
+    follower.close()
+
+
+def test_unsaved_polls_are_read_again_after_a_crash(tmp_path):
+    log = str(tmp_path / "latest.log")
+    state = str(tmp_path / "state.json")
+    append(log, line(0))
+    follower = LogFollower(log, state_path=state, save_interval=0)
+    follower.poll()
+    follower.save_interval = 3600
+    append(log, line(1))
+    follower.poll()
+    # No close(): the second line was never saved, so a new follower reads it once more
+    restarted = LogFollower(log, state_path=state)
+    assert restarted.summary.line_count == 1
+    assert restarted.poll() == 1
+    assert restarted.summary.line_count == 2
+    restarted.close()
@@ -0,0 +1,45 @@
+import os
+
+import parallel_parser
+from parallel_parser import parse_log_parallel, parse_range, split_ranges
+from transaction_parser import SOLD, BOUGHT, LINES, UNITS, MONEY, TransactionSummary, parse_log
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "transaction-log.txt")
+
+
+def assert_same_summary(summary, expected):
+    assert summary.line_count == expected.line_count
+    for action in (SOLD, BOUGHT):
+        assert summary.rank_players(action) == expected.rank_players(action)
+        for weight in (LINES, UNITS, MONEY):
+            assert summary.rank_items(action, weight=weight) == expected.rank_items(action, weight=weight)
+
+
+def test_ranges_start_at_lines(tmp_path):
+    lines = [f"[2023-07-11 10:00:{second:02d}] - Alex bought {second + 1} x Stone(Blocks.1) for ${second}.00 "
+             f"with the buy screen.\n" for second in range(10)]
+    log = tmp_path / "log.txt"
+    log.write_text("".join(lines))
+    size = os.path.getsize(log)
+    # A third of the file falls inside a line, which must stay whole in one range
+    assert (size // 3) % len(lines[0]) != 0
+
+    ranges = split_ranges(str(log), 3)
+    assert ranges[0][0] == 0 and ranges[-1][1] == size
+    data = log.read_bytes()
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[start - 1:start] == b"\n"
+
+    summary = TransactionSummary()
+    for start, end in ranges:
+        summary.merge(parse_range(str(log), start, end))
+    assert_same_summary(summary, parse_log(str(log)))
+
+
+def test_process_pool_matches_serial(monkeypatch):
+    # The sample log is below MIN_RANGE_BYTES, which would take the serial path
+    monkeypatch.setattr(parallel_parser, "MIN_RANGE_BYTES", 64 * 1024)
+    positions = []
+    summary = parse_log_parallel(SAMPLE_LOG, workers=4, progress=positions.append)
+    assert len(positions) == 4 and positions[-1] == os.path.getsize(SAMPLE_LOG)
+    assert_same_summary(summary, parse_log(SAMPLE_LOG))
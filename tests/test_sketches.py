@@ -0,0 +1,67 @@
+from sketches import HeavyHitters, HyperLogLog, SketchSummary, hash_key
+from transaction_parser import SOLD, iter_transactions
+
+
+def add(heavy_hitters, key, count=1, times=1):
+    for _ in range(times):
+        heavy_hitters.add(key, hash_key(key), count)
+
+
+def test_new_key_does_not_evict_larger_candidate():
+    heavy_hitters = HeavyHitters(capacity=2)
+    add(heavy_hitters, "A", times=100)
+    add(heavy_hitters, "B", times=100)
+    add(heavy_hitters, "C")
+    assert heavy_hitters.top() == [("A", 100), ("B", 100)]
+
+
+def test_heavy_hitters_survive_many_singletons():
+    # Wide enough that no singleton's estimate is pushed past 50 by collisions, so only the
+    # eviction rule is tested
+    heavy_hitters = HeavyHitters(capacity=64, width=8192)
+    for index in range(64):
+        add(heavy_hitters, f"heavy{index}", times=50)
+    for index in range(1000):
+        add(heavy_hitters, f"single{index}")
+    top = dict(heavy_hitters.top())
+    assert all(f"heavy{index}" in top for index in range(64))
+
+
+def test_larger_key_replaces_smallest_candidate():
+    heavy_hitters = HeavyHitters(capacity=2)
+    add(heavy_hitters, "A", times=10)
+    add(heavy_hitters, "B", times=5)
+    add(heavy_hitters, "C", times=20)
+    assert [key for key, _ in heavy_hitters.top()] == ["C", "A"]
+
+
+def test_merge_matches_single_sketch():
+    whole = HeavyHitters(capacity=4)
+    first = HeavyHitters(capacity=4)
+    second = HeavyHitters(capacity=4)
+    for index in range(200):
+        key = f"key{index % 7}"
+        add(whole, key, index)
+        add(first if index < 100 else second, key, index)
+    assert first.merge(second).top() == whole.top()
+
+
+def test_hyperloglog_estimate():
+    hyperloglog = HyperLogLog()
+    for index in range(10000):
+        hyperloglog.add(hash_key(f"player{index}"))
+    assert abs(hyperloglog.count() - 10000) < 10000 * 0.05
+
+
+def test_summary_rollup(tmp_path):
+    log = tmp_path / "log.txt"
+    log.write_text(
+        "[2023-07-10 10:00:00] - Alex sold 2 x Stone(Blocks.1) for $2.00 with the sell screen.\n"
+        "[2023-07-11 10:00:00] - Alex sold 3 x Stone(Blocks.1) for $3.00 with the sell screen.\n"
+        "[2023-07-11 11:00:00] - Steve sold 1 x Dirt(Blocks.2) for $9.00 with the sell screen.\n")
+    summary = SketchSummary().add_all(iter_transactions(str(log)))
+    assert summary.rank_players(SOLD) == {"2023-07-10": [("Alex", 2.0)],
+                                          "2023-07-11": [("Steve", 9.0), ("Alex", 3.0)]}
+    weekly = summary.rollup("week")
+    assert weekly.rank_players(SOLD) == {"2023-W28": [("Steve", 9.0), ("Alex", 5.0)]}
+    assert weekly.unique_players(SOLD) == {"2023-W28": 2}
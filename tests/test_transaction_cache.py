@@ -0,0 +1,53 @@
+import os
+
+import transaction_cache
+from transaction_cache import CACHE_EXTENSION, evict_cache
+
+
+def make_entries(folder, count, size=100, extension=CACHE_EXTENSION):
+    paths = []
+    for number in range(count):
+        path = os.path.join(folder, f"{number:064x}{extension}")
+        with open(path, 'wb') as file:
+            file.write(bytes(size))
+        os.utime(path, (number, number))
+        paths.append(path)
+    return paths
+
+
+def test_evict_oldest_first(tmp_path):
+    paths = make_entries(str(tmp_path), 4)
+    evict_cache(str(tmp_path), max_bytes=250, keep=paths[0])
+    assert [os.path.exists(path) for path in paths] == [True, False, False, True]
+
+
+def test_entries_removed_by_another_job(tmp_path, monkeypatch):
+    # Another job's eviction deletes entries between listing, stat and remove
+    paths = make_entries(str(tmp_path), 4)
+    stat = os.stat
+    remove = os.remove
+
+    def stat_after_removal(path, *args, **kwargs):
+        if path == paths[1]:
+            remove(path)
+        return stat(path, *args, **kwargs)
+
+    def remove_twice(path):
+        remove(path)
+        remove(path)
+
+    monkeypatch.setattr(transaction_cache.os, "stat", stat_after_removal)
+    monkeypatch.setattr(transaction_cache.os, "remove", remove_twice)
+    evict_cache(str(tmp_path), max_bytes=100)
+    monkeypatch.undo()
+    assert [os.path.exists(path) for path in paths] == [False, False, False, True]
+
+
+def test_only_artifacts_are_evicted(tmp_path):
+    # Reports batch.py writes next to the web app's workbooks are left alone
+    workbooks = make_entries(str(tmp_path), 2, extension=".xlsx")
+    report = tmp_path / "combined.xlsx"
+    report.write_bytes(bytes(1000))
+    os.utime(report, (0, 0))
+    evict_cache(str(tmp_path), max_bytes=100, extension=".xlsx")
+    assert report.exists() and [os.path.exists(path) for path in workbooks] == [False, True]
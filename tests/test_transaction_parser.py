@@ -0,0 +1,11 @@
+from transaction_parser import Item, parse_line, scan_transactions
+
+LINE = ("[2023-07-11 19:42:55] - Alex bought 2 x Axe (Sharp)(Tools.5), 14x Name Tag(Miscellaneous.21) "
+        "for $6.00 with the buy screen.")
+
+
+def test_item_id_is_the_last_bracket_group():
+    expected = (Item(2, "Axe (Sharp)", "Tools.5"), Item(14, "Name Tag", "Miscellaneous.21"))
+    assert parse_line(LINE).items == expected
+    # The bytes scanner uses the same grammar
+    assert [transaction.items for transaction in scan_transactions(LINE.encode("utf-8"))] == [expected]
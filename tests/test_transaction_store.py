@@ -0,0 +1,15 @@
+from transaction_cache import read_store, write_store
+from transaction_parser import iter_transactions
+from transaction_store import TransactionStore
+
+
+def test_more_screens_than_a_byte_holds(tmp_path):
+    # Plugins name their own screens; each distinct name gets a code in the screen column
+    log = "".join(f"[2023-07-11 10:00:00] - Alex bought 1 x Stone(Blocks.1) for $1.00 with the shop {number} screen.\n"
+                  for number in range(300))
+    (tmp_path / "screens.log").write_text(log)
+    store = TransactionStore().add_all(iter_transactions(str(tmp_path / "screens.log")))
+    assert store.transaction_dict(299)["screen"] == "shop 299 screen"
+
+    write_store(str(tmp_path / "log.tcache"), store)
+    assert read_store(str(tmp_path / "log.tcache")).transaction_dict(299)["screen"] == "shop 299 screen"
@@ -0,0 +1,61 @@
+from log_merge import merge_logs
+from transaction_parser import SOLD, BOUGHT, LINES, MONEY, iter_transactions
+from transaction_store import load_store
+import warehouse as warehouse_module
+from warehouse import Warehouse
+
+LOG = (
+    "[2023-07-11 10:00:00] - Alex bought 64 x Stone(Blocks.1) for $10.00 with the buy stacks screen.\n"
+    "[2023-07-11 10:00:00] - Alex bought 64 x Stone(Blocks.1) for $10.00 with the buy stacks screen.\n"
+    "[2023-07-11 10:00:05] - Steve sold 3 x Dirt(Blocks.2) for $1.50 with the sell screen.\n"
+    "[2023-07-12 09:00:00] - Steve sold 1 x Diamond(Ores.9) for $100.00 with the sell screen.\n"
+)
+
+
+def make_log(tmp_path, text=LOG, name="survival.log"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_rankings_match_store(tmp_path):
+    log = make_log(tmp_path)
+    store = load_store(log)
+    warehouse = Warehouse(str(tmp_path / "warehouse.db"))
+    assert warehouse.add_store(store) == 4
+    for action in (SOLD, BOUGHT):
+        assert warehouse.rank_players(action) == store.rank_players(action)
+        for weight in (LINES, MONEY):
+            assert warehouse.rank_items(action, weight=weight) == store.rank_items(action, weight=weight)
+
+
+def test_reingesting_adds_nothing(tmp_path):
+    log = make_log(tmp_path)
+    warehouse = Warehouse(str(tmp_path / "warehouse.db"))
+    assert warehouse.add_store(load_store(log)) == 4
+    assert warehouse.add_all(iter_transactions(log)) == 0
+    # The same file merged under a server name is still the same lines
+    assert warehouse.add_all(merge_logs([("survival", log)])) == 0
+    assert len(warehouse) == 4
+
+
+def test_overlapping_log_adds_only_new_lines(tmp_path):
+    warehouse = Warehouse(str(tmp_path / "warehouse.db"))
+    warehouse.add_all(iter_transactions(make_log(tmp_path)))
+    later = LOG.splitlines(keepends=True)[2:] + [
+        "[2023-07-13 09:00:00] - Alex sold 1 x Stone(Blocks.1) for $0.10 with the sell screen.\n"]
+    assert warehouse.add_all(iter_transactions(make_log(tmp_path, "".join(later), "later.log"))) == 1
+    assert len(warehouse) == 5
+
+
+def test_rewritten_block_is_kept(tmp_path, monkeypatch):
+    # The plugin sometimes writes a block of lines again after later ones; those copies are
+    # lines of their own, also once the counters of older timestamps have been dropped
+    monkeypatch.setattr(warehouse_module, "REPEAT_WINDOW", 3)
+    block = LOG.splitlines(keepends=True)[:3]
+    later = [f"[2023-07-11 11:00:{second:02d}] - Steve sold 1 x Dirt(Blocks.2) for $0.50 with the sell screen.\n"
+             for second in range(3)]
+    log = make_log(tmp_path, "".join(block + later[:1] + block + later[1:]))
+    warehouse = Warehouse(str(tmp_path / "warehouse.db"))
+    assert warehouse.add_all(iter_transactions(log)) == 9
+    assert warehouse.add_all(iter_transactions(log)) == 0
@@ -0,0 +1,240 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+
+from parallel_parser import parse_log_parallel
+from transaction_parser import TransactionSummary
+from transaction_store import TransactionStore, load_store
+
+CACHE_MAGIC = b"TXCACHE2"
+CACHE_EXTENSION = ".tcache"
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_OUTPUT_MAX_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+# Cache entries and output files are named after a sha256 (see artifact_name); other files in
+# those folders, such as batch.py reports in output/, are never evicted
+ARTIFACT_STEM = re.compile(r"[0-9a-f]{64}")
+
+INTERNERS = ("dates", "players", "screens", "items")
+COLUMNS = ("day", "seconds", "player", "action", "screen", "currency", "amount",
+           "item_row", "item", "quantity", "item_amount")
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Rewound:
+    # Replays the bytes already taken from the start of stream, then reads on from it
+
+    def __init__(self, head, stream):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.stream.read(), b""
+        else:
+            data, self.head = self.head[:size], self.head[size:]
+        return data
+
+
+def open_log_stream(stream):
+    # File-like over the log's bytes, gunzipped on the fly when the upload is gzip compressed
+    head = b""
+    while len(head) < len(GZIP_MAGIC):
+        data = stream.read(len(GZIP_MAGIC) - len(head))
+        if not data:
+            break
+        head += data
+    stream = _Rewound(head, stream)
+    if head == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
+
+def save_upload(file_storage, upload_folder, keep=True):
+    # Write the uploaded file and hash it in the same pass. The file is named after its
+    # content, so concurrent uploads never overwrite a log another job is still reading.
+    # Gzip uploads are stored decompressed and hashed like the plain log.
+    # With keep false the file keeps its unique temporary name, for the job to delete when done.
+    digest = hashlib.sha256()
+    log_stream = open_log_stream(file_storage.stream)
+    fd, temp_path = tempfile.mkstemp(dir=upload_folder, suffix=".upload")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in iter(lambda: log_stream.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                file.write(chunk)
+        if not keep:
+            return temp_path, digest.hexdigest()
+        file_path = os.path.join(upload_folder, digest.hexdigest() + ".log")
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return file_path, digest.hexdigest()
+
+
+def artifact_name(digest, extension, **options):
+    # Content-addressed output name: the same log with the same options maps to the same file
+    key = hashlib.sha256(digest.encode("ascii"))
+    for name in sorted(options):
+        key.update(f"\0{name}={options[name]!r}".encode("utf-8"))
+    return key.hexdigest() + extension
+
+
+def cache_path(cache_folder, digest):
+    return os.path.join(cache_folder, digest + CACHE_EXTENSION)
+
+
+def write_store(file_path, store):
+    # Layout: magic, header length, JSON header (interned values, column layout and
+    # full per-day rankings), then the raw bytes of every column in COLUMNS order.
+    # A TransactionSummary has no columns, its aggregates go in the header.
+    if isinstance(store, TransactionSummary):
+        header = {"summary": store.to_dict()}
+        columns = ()
+    else:
+        header = {
+            "byteorder": sys.byteorder,
+            "interners": {name: getattr(store, name).values for name in INTERNERS},
+            "columns": [[name, getattr(store, name).typecode, len(getattr(store, name))] for name in COLUMNS],
+            "rankings": [[list(key), ranked] for key, ranked in store.rankings.items()],
+        }
+        columns = COLUMNS
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    folder = os.path.dirname(file_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(CACHE_MAGIC)
+            file.write(struct.pack("<Q", len(header_bytes)))
+            file.write(header_bytes)
+            for name in columns:
+                getattr(store, name).tofile(file)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_store(file_path):
+    store = TransactionStore()
+    with open(file_path, 'rb') as file:
+        if file.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError(f"Not a transaction cache file: {file_path}")
+        header_length, = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(header_length).decode("utf-8"))
+        if "summary" in header:
+            return TransactionSummary.from_dict(header["summary"])
+
+        for name in INTERNERS:
+            interner = getattr(store, name)
+            for value in header["interners"][name]:
+                interner.intern(tuple(value) if isinstance(value, list) else value)
+
+        for name, typecode, length in header["columns"]:
+            column = array(typecode)
+            column.fromfile(file, length)
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            setattr(store, name, column)
+
+    for key, ranked in header["rankings"]:
+        store.rankings[tuple(key)] = {
+            date: [(tuple(label) if isinstance(label, list) else label, total) for label, total in entries]
+            for date, entries in ranked.items()
+        }
+    return store
+
+
+def evict_cache(cache_folder, max_bytes=DEFAULT_CACHE_MAX_BYTES, keep=None, extension=CACHE_EXTENSION):
+    # Least recently used first: every cache hit refreshes the file's mtime.
+    # Jobs evict concurrently, so an entry may disappear at any point; it no longer counts.
+    entries = []
+    for name in os.listdir(cache_folder):
+        if name.endswith(extension) and ARTIFACT_STEM.fullmatch(name[:-len(extension)]):
+            path = os.path.join(cache_folder, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def touch_cached_store(cache_folder, digest):
+    # Whether digest has a cache entry; marks it as just used so eviction keeps it for now
+    try:
+        os.utime(cache_path(cache_folder, digest))
+        return True
+    except OSError:
+        return False
+
+
+def read_cached_store(cache_folder, digest):
+    # The cached store or summary for digest, None when there is no readable entry
+    path = cache_path(cache_folder, digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        store = read_store(path)
+        os.utime(path)
+        return store
+    except (OSError, ValueError, EOFError):
+        # Unreadable or truncated entry, the caller rebuilds it
+        return None
+
+
+def load_cached_store(cache_folder, digest, log_file_path, max_bytes=DEFAULT_CACHE_MAX_BYTES, workers=1,
+                      progress=None):
+    os.makedirs(cache_folder, exist_ok=True)
+    store = read_cached_store(cache_folder, digest)
+    if store is not None:
+        return store
+
+    if workers > 1:
+        # Parallel parsing only produces the per-day aggregates, not the columnar store
+        store = parse_log_parallel(log_file_path, workers, progress)
+    else:
+        store = load_store(log_file_path, progress)
+    return cache_store(cache_folder, digest, store, max_bytes)
+
+
+def cache_store(cache_folder, digest, store, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    # Save a freshly parsed log under its digest, with its rankings precomputed
+    os.makedirs(cache_folder, exist_ok=True)
+    path = cache_path(cache_folder, digest)
+    if isinstance(store, TransactionStore):
+        store.precompute_rankings()
+    write_store(path, store)
+    evict_cache(cache_folder, max_bytes, keep=path)
+    return store
@@ -0,0 +1,277 @@
+import heapq
+import mmap
+import re
+from collections import defaultdict, namedtuple
+from functools import partial
+from operator import itemgetter
+
+# Compiled once at import so the per-line cost is a single match call.
+# Example lines:
+#   [2023-07-11 19:42:55] - itsarthurr bought 64 x Hay Block(Blocks.3) for $3,182.52 with the buy stacks screen.
+#   [2023-07-18 09:51:07] - 逇 jacktan_ sold 30x Arrow(Mobs.1), 14x Name Tag(Miscellaneous.21) for $6,535.34 with the sell gui.
+#   [2023-07-17 18:32:30] - _Yusaki bought 2 x Custom Enchant Key(Keys.2) for 70.00 levels with the buy screen.
+LINE_PATTERN = re.compile(
+    r"^\[(?P<date>\d{4}-\d{2}-\d{2}) (?P<time>\d{2}:\d{2}:\d{2})\] - "
+    r"(?:(?P<rank>\S+)[ \t]+)?(?P<player>\S+) (?P<action>sold|bought) "
+    r"(?P<items>.*\)) for (?:\$(?P<money>[\d,\.]+)|(?P<levels>[\d,\.]+) levels)"
+    r"(?: with the (?P<screen>[^.\r\n]+))?",
+    re.MULTILINE
+)
+# The id is the parenthesised group that ends the item, so names with brackets of their own,
+# such as "2 x Axe (Sharp)(Tools.5)", keep them in the name.
+ITEM_PATTERN = re.compile(r"(?P<quantity>\d+) ?x (?P<name>[^,]*?)\((?P<item_id>[^()]*)\)(?=,\s|$)")
+
+# The same grammar over raw bytes, used to scan memory-mapped files without decoding whole lines.
+# Rank glyphs such as 逈 are multi-byte UTF-8, which \S matches byte by byte, so they still
+# land in the rank group. No group can cross a newline, so finditer stays on line boundaries.
+LINE_PATTERN_BYTES = re.compile(LINE_PATTERN.pattern.encode("ascii"), re.MULTILINE)
+ITEM_PATTERN_BYTES = re.compile(ITEM_PATTERN.pattern.encode("ascii"))
+
+SOLD = "sold"
+BOUGHT = "bought"
+
+# What an item ranking adds up: transactions the item appears in, units moved, or dollars
+LINES = "lines"
+UNITS = "units"
+MONEY = "money"
+
+Item = namedtuple("Item", "quantity name item_id")
+
+
+class Transaction(namedtuple("Transaction", "date time player rank action screen items price currency server",
+                             defaults=(None,))):
+    # server names the server a merged log line came from (see log_merge.py), None otherwise
+    __slots__ = ()
+
+
+def parse_line(line):
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None
+
+    items = tuple(
+        Item(int(quantity), name.strip(), item_id)
+        for quantity, name, item_id in ITEM_PATTERN.findall(match.group("items"))
+    )
+    money = match.group("money")
+    if money is not None:
+        price = round(float(money.replace(",", "")), 2)
+        currency = "$"
+    else:
+        price = round(float(match.group("levels").replace(",", "")), 2)
+        currency = "levels"
+
+    return Transaction(match.group("date"), match.group("time"), match.group("player"), match.group("rank"),
+                       match.group("action"), match.group("screen"), items, price, currency)
+
+
+# Player names, dates, screens and whole item lists repeat constantly in shop logs,
+# so each distinct value is decoded/parsed once. Item tuples are immutable and safe to share.
+# Every scan gets its own caches, dropped when it ends, and each holds at most CACHE_LIMIT values.
+CACHE_LIMIT = 1 << 16
+
+
+class _ByteDecoder:
+
+    def __init__(self):
+        self.decoded = {}
+        self.parsed_items = {}
+
+    def decode(self, value):
+        text = self.decoded.get(value)
+        if text is None:
+            if len(self.decoded) >= CACHE_LIMIT:
+                self.decoded.clear()
+            text = self.decoded[value] = value.decode('utf-8', errors='replace')
+        return text
+
+    def items(self, items):
+        parsed = self.parsed_items.get(items)
+        if parsed is None:
+            if len(self.parsed_items) >= CACHE_LIMIT:
+                self.parsed_items.clear()
+            decode = self.decode
+            parsed = self.parsed_items[items] = tuple(
+                Item(int(quantity), decode(name.strip()), decode(item_id))
+                for quantity, name, item_id in ITEM_PATTERN_BYTES.findall(items)
+            )
+        return parsed
+
+    def transaction(self, match):
+        # Only the captured fields are decoded, the line itself is never copied to a str
+        date, time, rank, player, action, items, money, levels, screen = match.groups()
+        if money is not None:
+            price = round(float(money.replace(b",", b"")), 2)
+            currency = "$"
+        else:
+            price = round(float(levels.replace(b",", b"")), 2)
+            currency = "levels"
+
+        decode = self.decode
+        return Transaction(decode(date), time.decode("ascii"), decode(player),
+                           decode(rank) if rank is not None else None,
+                           SOLD if action == b"sold" else BOUGHT,
+                           decode(screen) if screen is not None else None,
+                           self.items(items), price, currency)
+
+
+PROGRESS_EVERY = 4096
+
+
+def scan_transactions(buffer, start=0, end=None, progress=None):
+    # Scan a bytes-like buffer (bytes, bytearray or mmap) for transactions between start and end.
+    # progress, if given, is called with the byte position every PROGRESS_EVERY transactions.
+    if end is None:
+        end = len(buffer)
+    transaction = _ByteDecoder().transaction
+    if progress is None:
+        for match in LINE_PATTERN_BYTES.finditer(buffer, start, end):
+            yield transaction(match)
+        return
+
+    for count, match in enumerate(LINE_PATTERN_BYTES.finditer(buffer, start, end), start=1):
+        if not count % PROGRESS_EVERY:
+            progress(match.end())
+        yield transaction(match)
+    progress(end)
+
+
+def iter_transactions(file_path, start=0, end=None, progress=None):
+    with open(file_path, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with buffer:
+            yield from scan_transactions(buffer, start, end, progress)
+
+
+def _per_day_table():
+    # {action: {date: {key: total}}}; partial() rather than lambdas so summaries can be pickled
+    return {SOLD: defaultdict(partial(defaultdict, int)), BOUGHT: defaultdict(partial(defaultdict, int))}
+
+
+class TransactionSummary:
+    # Every per-day aggregate the app needs, filled in a single pass over the log.
+    # Item tables are kept per weight: lines (transactions), units (quantity) and money (cents).
+    # Money totals are integer cents so incremental and merged sums stay exact.
+
+    ITEM_TABLES = {LINES: "item_counts", UNITS: "item_units", MONEY: "item_money"}
+
+    def __init__(self):
+        self.item_counts = _per_day_table()
+        self.item_units = _per_day_table()
+        self.item_money = _per_day_table()
+        self.player_totals = _per_day_table()
+        self.line_count = 0
+
+    def add(self, transaction):
+        self.line_count += 1
+        action = transaction.action
+        date = transaction.date
+        items = transaction.items
+
+        item_count = self.item_counts[action][date]
+        item_units = self.item_units[action][date]
+        for item in items:
+            key = (item.name, item.item_id)
+            item_count[key] += 1
+            item_units[key] += item.quantity
+
+        # Only money transactions count towards money totals; level purchases are not dollars.
+        if transaction.currency == "$":
+            cents = round(transaction.price * 100)
+            self.player_totals[action][date][transaction.player] += cents
+            item_money = self.item_money[action][date]
+            for item, item_cents in zip(items, item_amounts(cents, items)):
+                item_money[(item.name, item.item_id)] += item_cents
+
+    def add_all(self, transactions):
+        for transaction in transactions:
+            self.add(transaction)
+        return self
+
+    def _tables(self):
+        return [(name, getattr(self, name)) for name in (*self.ITEM_TABLES.values(), "player_totals")]
+
+    def merge(self, other):
+        # Fold in a summary of a later part of the log, keeping first-appearance order
+        self.line_count += other.line_count
+        for name, table in self._tables():
+            for action, per_day in getattr(other, name).items():
+                for date, totals in per_day.items():
+                    merged = table[action][date]
+                    for key, total in totals.items():
+                        merged[key] += total
+        return self
+
+    def rank_players(self, action, player_limit=None):
+        ranked = rank_per_day(self.player_totals[action], player_limit)
+        return {date: [(player, cents / 100) for player, cents in players] for date, players in ranked.items()}
+
+    def rank_items(self, action, item_limit=None, weight=LINES):
+        ranked = rank_per_day(getattr(self, self.ITEM_TABLES[weight])[action], item_limit)
+        if weight == MONEY:
+            return {date: [(item, cents / 100) for item, cents in items] for date, items in ranked.items()}
+        return ranked
+
+    def to_dict(self):
+        data = {"line_count": self.line_count}
+        for name, table in self._tables():
+            data[name] = {action: {date: [[*key, total] if isinstance(key, tuple) else [key, total]
+                                          for key, total in totals.items()]
+                                   for date, totals in per_day.items()}
+                          for action, per_day in table.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.line_count = data["line_count"]
+        for name, table in summary._tables():
+            for action, per_day in data.get(name, {}).items():
+                for date, entries in per_day.items():
+                    totals = table[action][date]
+                    for *key, total in entries:
+                        totals[tuple(key) if len(key) > 1 else key[0]] = total
+        return summary
+
+
+def item_amounts(cents, items):
+    # Split a line's price over its items in proportion to quantity; the rounding
+    # remainder goes to the first item so the parts always add up to the line total.
+    if len(items) == 1:
+        return (cents,)
+    quantity = sum(item.quantity for item in items)
+    if not quantity:
+        return (cents,) + (0,) * (len(items) - 1)
+    shares = [cents * item.quantity // quantity for item in items]
+    shares[0] += cents - sum(shares)
+    return shares
+
+
+def top_k(totals, limit=None):
+    # Highest total first; ties keep the order they first appeared in the log.
+    # With a limit only a heap of `limit` entries is kept instead of sorting everything.
+    if limit:
+        return heapq.nlargest(limit, totals.items(), key=itemgetter(1))
+    return sorted(totals.items(), key=itemgetter(1), reverse=True)
+
+
+def rank_per_day(totals_per_day, limit=None):
+    return {date: top_k(totals, limit) for date, totals in totals_per_day.items()}
+
+
+def limit_per_day(ranked_per_day, limit=None):
+    return {date: ranked[:limit] if limit else list(ranked) for date, ranked in ranked_per_day.items()}
+
+
+def parse_log(file_path, progress=None):
+    return TransactionSummary().add_all(iter_transactions(file_path, progress=progress))
+
+
+def format_item(name, item_id, include_id=True):
+    if include_id:
+        return f"{name}({item_id})"
+    return name
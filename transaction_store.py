@@ -0,0 +1,294 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache, partial
+
+from transaction_parser import (SOLD, BOUGHT, LINES, UNITS, MONEY, item_amounts, iter_transactions, limit_per_day,
+                                rank_per_day)
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    # NumPy is optional, the store falls back to plain Python loops. It is most of the cost of
+    # importing the engine, so it is only loaded when a store first ranks or filters rows.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+ACTIONS = (SOLD, BOUGHT)
+ITEM_WEIGHTS = (LINES, UNITS, MONEY)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+CURRENCIES = ("$", "levels")
+CURRENCY_CODES = {currency: code for code, currency in enumerate(CURRENCIES)}
+DOLLARS = CURRENCY_CODES["$"]
+
+
+class Interner:
+    # Maps repeated values (dates, players, items, screens) to small integer codes
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def intern(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class TransactionStore:
+    # Columnar, in-memory copy of every parsed transaction.
+    # One row per log line in the transaction columns, one row per item in the item columns.
+    # Amounts are stored as integer cents so sums are exact.
+
+    def __init__(self):
+        self.dates = Interner()
+        self.players = Interner()
+        self.screens = Interner()
+        self.items = Interner()
+
+        self.day = array('i')
+        self.seconds = array('i')
+        self.player = array('i')
+        self.action = array('b')
+        self.screen = array('i')
+        self.currency = array('b')
+        self.amount = array('q')
+
+        self.item_row = array('q')
+        self.item = array('i')
+        self.quantity = array('q')
+        self.item_amount = array('q')
+
+        # Full (unlimited) rankings keyed by (kind, action[, weight]), reused for every limit
+        self.rankings = {}
+        # Rollup cube (see rollups.store_cube), built from the columns when a query first needs it
+        self.cube = None
+
+    def __len__(self):
+        return len(self.day)
+
+    def add(self, transaction):
+        self.rankings.clear()
+        self.cube = None
+        row = len(self.day)
+        hours, minutes, seconds = transaction.time.split(":")
+
+        self.day.append(self.dates.intern(transaction.date))
+        self.seconds.append(int(hours) * 3600 + int(minutes) * 60 + int(seconds))
+        self.player.append(self.players.intern(transaction.player))
+        self.action.append(ACTION_CODES[transaction.action])
+        self.screen.append(self.screens.intern(transaction.screen))
+        self.currency.append(CURRENCY_CODES[transaction.currency])
+        self.amount.append(round(transaction.price * 100))
+
+        # Each item's share of the line price, so money-weighted item rankings add up exactly
+        items = transaction.items
+        for item, item_cents in zip(items, item_amounts(self.amount[-1], items)):
+            self.item_row.append(row)
+            self.item.append(self.items.intern((item.name, item.item_id)))
+            self.quantity.append(item.quantity)
+            self.item_amount.append(item_cents)
+
+    def add_all(self, transactions):
+        for transaction in transactions:
+            self.add(transaction)
+        return self
+
+    def rank_players(self, action, player_limit=None):
+        return self._ranked(("players", action), partial(self._rank_players, action), player_limit)
+
+    def rank_items(self, action, item_limit=None, weight=LINES):
+        return self._ranked(("items", action, weight), partial(self._rank_items, action, weight=weight), item_limit)
+
+    def _ranked(self, key, rank, limit):
+        # Slice the full ranking when it is already known; otherwise a limited request
+        # only computes the top `limit` per day and an unlimited one is memoised.
+        ranked = self.rankings.get(key)
+        if ranked is not None:
+            return limit_per_day(ranked, limit)
+        if limit:
+            return rank(limit)
+        ranked = self.rankings[key] = rank()
+        return limit_per_day(ranked)
+
+    def precompute_rankings(self):
+        for action in ACTIONS:
+            self.rank_players(action)
+            for weight in ITEM_WEIGHTS:
+                self.rank_items(action, weight=weight)
+
+    def player_history(self, player, action=None, start=None, end=None):
+        # Every transaction of one player in log order; start and end are inclusive dates
+        code = self.players.codes.get(player)
+        if code is None:
+            return []
+        days = self._day_codes(start, end)
+        action_code = ACTION_CODES.get(action)
+        return [self.transaction_dict(row) for row in self._rows_where(self.player, (code,))
+                if self.day[row] in days and (action_code is None or self.action[row] == action_code)]
+
+    def item_prices(self, item_id, action=None, start=None, end=None, player=None):
+        # Price points of one item id in log order. For multi-item lines the price is the
+        # item's quantity-weighted share of the line, as in the money rankings.
+        codes = tuple(code for code, (_, value) in enumerate(self.items.values) if value == item_id)
+        days = self._day_codes(start, end)
+        action_code = ACTION_CODES.get(action)
+        player_code = self.players.codes.get(player, -1) if player is not None else None
+
+        prices = []
+        for index in self._rows_where(self.item, codes):
+            row = self.item_row[index]
+            if self.day[row] not in days or (action_code is not None and self.action[row] != action_code):
+                continue
+            if player_code is not None and self.player[row] != player_code:
+                continue
+            quantity = self.quantity[index]
+            amount = self.item_amount[index] / 100
+            prices.append({
+                "date": self.dates.values[self.day[row]],
+                "time": _format_seconds(self.seconds[row]),
+                "player": self.players.values[self.player[row]],
+                "action": ACTIONS[self.action[row]],
+                "name": self.items.values[self.item[index]][0],
+                "quantity": quantity,
+                "price": amount,
+                "unit_price": round(amount / quantity, 4) if quantity else None,
+                "currency": CURRENCIES[self.currency[row]],
+            })
+        return prices
+
+    def transaction_dict(self, row):
+        first = bisect_left(self.item_row, row)
+        last = bisect_right(self.item_row, row, first)
+        return {
+            "date": self.dates.values[self.day[row]],
+            "time": _format_seconds(self.seconds[row]),
+            "player": self.players.values[self.player[row]],
+            "action": ACTIONS[self.action[row]],
+            "screen": self.screens.values[self.screen[row]],
+            "items": [{"name": self.items.values[self.item[index]][0], "item_id": self.items.values[self.item[index]][1],
+                       "quantity": self.quantity[index]}
+                      for index in range(first, last)],
+            "price": self.amount[row] / 100,
+            "currency": CURRENCIES[self.currency[row]],
+        }
+
+    def _day_codes(self, start=None, end=None):
+        return {code for code, date in enumerate(self.dates.values)
+                if (start is None or date >= start) and (end is None or date <= end)}
+
+    def _rows_where(self, column, codes):
+        # Row numbers whose value in column is one of codes, in log order
+        if not codes:
+            return []
+        np = _numpy()
+        if np is not None:
+            return np.flatnonzero(np.isin(_column(column, np.int32), codes)).tolist()
+        codes = set(codes)
+        return [row for row, value in enumerate(column) if value in codes]
+
+    def _rank_players(self, action, player_limit=None):
+        action_code = ACTION_CODES[action]
+        np = _numpy()
+        if np is not None:
+            mask = (_column(self.action, np.int8) == action_code) & (_column(self.currency, np.int8) == DOLLARS)
+            ranked = self._rank_vectorized(mask, _column(self.day, np.int32), _column(self.player, np.int32),
+                                           _column(self.amount, np.int64), self.players.values, player_limit)
+        else:
+            rows = (row for row in range(len(self.day))
+                    if self.action[row] == action_code and self.currency[row] == DOLLARS)
+            ranked = self._rank_rows(rows, self.day, self.player, self.amount, self.players.values, player_limit)
+
+        # Totals are summed in cents, report them in dollars
+        return {date: [(player, cents / 100) for player, cents in players] for date, players in ranked.items()}
+
+    def _rank_items(self, action, item_limit=None, weight=LINES):
+        action_code = ACTION_CODES[action]
+        weights = {LINES: None, UNITS: self.quantity, MONEY: self.item_amount}[weight]
+        np = _numpy()
+        if np is not None:
+            item_row = _column(self.item_row, np.int64)
+            mask = _column(self.action, np.int8)[item_row] == action_code
+            if weight == MONEY:
+                mask &= _column(self.currency, np.int8)[item_row] == DOLLARS
+            day = _column(self.day, np.int32)[item_row]
+            ranked = self._rank_vectorized(mask, day, _column(self.item, np.int32),
+                                           None if weights is None else _column(weights, np.int64),
+                                           self.items.values, item_limit)
+        else:
+            rows = (row for row in range(len(self.item_row))
+                    if self.action[self.item_row[row]] == action_code
+                    and (weight != MONEY or self.currency[self.item_row[row]] == DOLLARS))
+            day = [self.day[row] for row in self.item_row]
+            ranked = self._rank_rows(rows, day, self.item, weights, self.items.values, item_limit)
+
+        if weight == MONEY:
+            return {date: [(item, cents / 100) for item, cents in items] for date, items in ranked.items()}
+        return ranked
+
+    def _rank_rows(self, rows, day, key, weights, labels, limit):
+        # Plain Python fallback used when NumPy is not installed
+        totals_per_day = {}
+        for row in rows:
+            totals = totals_per_day.setdefault(self.dates.values[day[row]], {})
+            label = labels[key[row]]
+            totals[label] = totals.get(label, 0) + (weights[row] if weights is not None else 1)
+
+        return rank_per_day(totals_per_day, limit)
+
+    def _rank_vectorized(self, mask, day, key, weights, labels, limit):
+        # Group by (day, key), sum, then sort each day by total descending,
+        # breaking ties by first appearance in the log like the dict-based path.
+        np = _numpy()
+        positions = np.flatnonzero(mask)
+        if not len(positions):
+            return {}
+        combined = day[positions].astype(np.int64) * max(len(labels), 1) + key[positions]
+        groups, first, inverse = np.unique(combined, return_index=True, return_inverse=True)
+        if weights is None:
+            totals = np.bincount(inverse)
+        else:
+            totals = np.bincount(inverse, weights=weights[positions]).astype(np.int64)
+
+        group_day = groups // max(len(labels), 1)
+        group_key = groups % max(len(labels), 1)
+        day_first = np.full(len(self.dates), len(positions), dtype=np.int64)
+        np.minimum.at(day_first, group_day, first)
+        order = np.lexsort((first, -totals, day_first[group_day]))
+
+        sorted_day = group_day[order]
+        starts = np.flatnonzero(np.r_[True, sorted_day[1:] != sorted_day[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        if limit:
+            keep = rank < limit
+            order, sorted_day = order[keep], sorted_day[keep]
+
+        ranked_per_day = {}
+        for day_code, key_code, total in zip(sorted_day.tolist(), group_key[order].tolist(), totals[order].tolist()):
+            ranked_per_day.setdefault(self.dates.values[day_code], []).append((labels[key_code], total))
+        return ranked_per_day
+
+
+def _format_seconds(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _column(values, dtype):
+    # Zero-copy NumPy view over an array.array column
+    np = _numpy()
+    if not len(values):
+        return np.empty(0, dtype=dtype)
+    return np.frombuffer(values, dtype=dtype)
+
+
+def load_store(file_path, progress=None):
+    return TransactionStore().add_all(iter_transactions(file_path, progress=progress))
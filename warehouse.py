@@ -0,0 +1,257 @@
+import hashlib
+import sqlite3
+import threading
+
+from transaction_parser import LINES, UNITS, MONEY, item_amounts
+from transaction_store import ACTIONS, CURRENCIES
+
+# Optional SQLite copy of every parsed transaction, so rankings over months of uploads are
+# indexed queries instead of rescans. Rows are deduplicated on a fingerprint of the line,
+# re-ingesting a log that overlaps an earlier one only adds the new lines.
+
+BATCH_SIZE = 10000
+# Copies of a line count as repeats while they are at most this many timestamp changes apart
+REPEAT_WINDOW = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    fingerprint BLOB NOT NULL UNIQUE,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    server TEXT,
+    player TEXT NOT NULL,
+    action TEXT NOT NULL,
+    screen TEXT,
+    currency TEXT NOT NULL,
+    cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transaction_items (
+    fingerprint BLOB NOT NULL,
+    position INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    server TEXT,
+    action TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    name TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    cents INTEGER NOT NULL,
+    UNIQUE (fingerprint, position)
+);
+CREATE INDEX IF NOT EXISTS transactions_date_action ON transactions (date, action);
+CREATE INDEX IF NOT EXISTS transactions_player ON transactions (player);
+CREATE INDEX IF NOT EXISTS transaction_items_date_action ON transaction_items (date, action);
+CREATE INDEX IF NOT EXISTS transaction_items_item_id ON transaction_items (item_id);
+"""
+
+# Item ranking weights as SQL aggregates over transaction_items
+ITEM_AGGREGATES = {LINES: "COUNT(*)", UNITS: "SUM(quantity)", MONEY: "SUM(cents)"}
+
+
+def _line_digest(record):
+    # record is (server, date, time, player, action, screen, currency, cents, items). Only the
+    # line itself is hashed: the server is a plain column, so a log ingested on its own and
+    # again as part of a merged upload is stored once.
+    return hashlib.blake2b(repr(record[1:]).encode("utf-8"), digest_size=16)
+
+
+def transaction_records(transactions, server=None):
+    # Normalised (server, date, time, player, action, screen, currency, cents, items) records,
+    # items as (name, item_id, quantity, cents) with the line price split like the rankings
+    for transaction in transactions:
+        cents = round(transaction.price * 100)
+        items = tuple((item.name, item.item_id, item.quantity, item_cents)
+                      for item, item_cents in zip(transaction.items, item_amounts(cents, transaction.items)))
+        yield (transaction.server or server, transaction.date, transaction.time, transaction.player,
+               transaction.action, transaction.screen, transaction.currency, cents, items)
+
+
+def store_records(store, server=None):
+    # The same records read back from a TransactionStore's columns
+    item_index = 0
+    item_count = len(store.item_row)
+    for row in range(len(store)):
+        items = []
+        while item_index < item_count and store.item_row[item_index] == row:
+            name, item_id = store.items.values[store.item[item_index]]
+            items.append((name, item_id, store.quantity[item_index], store.item_amount[item_index]))
+            item_index += 1
+        seconds = store.seconds[row]
+        yield (server, store.dates.values[store.day[row]],
+               f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}",
+               store.players.values[store.player[row]], ACTIONS[store.action[row]],
+               store.screens.values[store.screen[row]], CURRENCIES[store.currency[row]], store.amount[row],
+               tuple(items))
+
+
+class Warehouse:
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        # SQLite allows one writer at a time; WAL lets readers carry on while it writes
+        self._write_lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        # A connection per call, so jobs and requests on different threads never share one
+        connection = sqlite3.connect(self.database_path, timeout=60)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def add_all(self, transactions, server=None):
+        return self.add_records(transaction_records(transactions, server))
+
+    def add_store(self, store, server=None):
+        return self.add_records(store_records(store, server))
+
+    def add_records(self, records):
+        # Bulk load in batches of BATCH_SIZE lines, one SQL transaction per batch.
+        # Returns the number of lines that were not in the warehouse yet.
+        added = 0
+        with self._write_lock:
+            connection = self._connect()
+            try:
+                batch = []
+                for record in self._fingerprinted(records):
+                    batch.append(record)
+                    if len(batch) == BATCH_SIZE:
+                        added += self._insert(connection, batch)
+                        batch = []
+                if batch:
+                    added += self._insert(connection, batch)
+            finally:
+                connection.close()
+        return added
+
+    @staticmethod
+    def _fingerprinted(records):
+        # The same line can legitimately appear several times in one log (repeated purchases
+        # in one second, blocks the plugin wrote twice), so the n-th copy of a line within
+        # the ingested log gets its own fingerprint. Re-ingesting the log, or a later one
+        # that repeats it, produces the same fingerprints again.
+        # Rewritten blocks reappear a few dozen lines (and seconds) later, so the counters only
+        # cover the last REPEAT_WINDOW to 2 * REPEAT_WINDOW timestamps: every REPEAT_WINDOW
+        # changes of (date, time) the older half is dropped, and memory stays flat on any log.
+        recent = {}
+        older = {}
+        timestamp = None
+        changes = 0
+        for record in records:
+            if record[1:3] != timestamp:
+                timestamp = record[1:3]
+                changes += 1
+                if changes == REPEAT_WINDOW:
+                    older, recent = recent, {}
+                    changes = 0
+            digest = _line_digest(record)
+            key = digest.digest()
+            occurrence = recent[key] = recent.get(key, older.get(key, -1)) + 1
+            if occurrence:
+                digest.update(occurrence.to_bytes(4, "little"))
+                key = digest.digest()
+            yield key, record
+
+    @staticmethod
+    def _insert(connection, batch):
+        with connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO transactions "
+                "(fingerprint, server, date, time, player, action, screen, currency, cents) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((fingerprint, *record[:8]) for fingerprint, record in batch))
+            added = connection.total_changes - before
+            connection.executemany(
+                "INSERT OR IGNORE INTO transaction_items "
+                "(fingerprint, position, date, server, action, currency, name, item_id, quantity, cents) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((fingerprint, position, record[1], record[0], record[4], record[6], *item)
+                 for fingerprint, record in batch
+                 for position, item in enumerate(record[8])))
+        return added
+
+    def __len__(self):
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        finally:
+            connection.close()
+
+    def query(self, start=None, end=None, server=None):
+        # Rankings restricted to a date range (inclusive "YYYY-MM-DD") and/or one server
+        return WarehouseQuery(self, start, end, server)
+
+    def rank_players(self, action, player_limit=None):
+        return self.query().rank_players(action, player_limit)
+
+    def rank_items(self, action, item_limit=None, weight=LINES):
+        return self.query().rank_items(action, item_limit, weight)
+
+
+class WarehouseQuery:
+    # Same rank_players/rank_items interface as TransactionStore, answered with indexed SQL.
+    # Ties are broken by first appearance (insertion order) like the in-memory rankings.
+
+    def __init__(self, warehouse, start=None, end=None, server=None):
+        self.warehouse = warehouse
+        self.start = start
+        self.end = end
+        self.server = server
+
+    def _filters(self, action):
+        conditions = ["action = ?"]
+        parameters = [action]
+        if self.start is not None:
+            conditions.append("date >= ?")
+            parameters.append(self.start)
+        if self.end is not None:
+            conditions.append("date <= ?")
+            parameters.append(self.end)
+        if self.server is not None:
+            conditions.append("server = ?")
+            parameters.append(self.server)
+        return conditions, parameters
+
+    def _query(self, sql, parameters):
+        connection = self.warehouse._connect()
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def rank_players(self, action, player_limit=None):
+        conditions, parameters = self._filters(action)
+        conditions.append("currency = '$'")
+        rows = self._query(_ranking_sql("player", "SUM(cents)", "transactions", conditions, player_limit),
+                           parameters)
+        ranked = {}
+        for date, player, cents in rows:
+            ranked.setdefault(date, []).append((player, cents / 100))
+        return ranked
+
+    def rank_items(self, action, item_limit=None, weight=LINES):
+        conditions, parameters = self._filters(action)
+        if weight == MONEY:
+            conditions.append("currency = '$'")
+        rows = self._query(_ranking_sql("name, item_id", ITEM_AGGREGATES[weight], "transaction_items", conditions,
+                                        item_limit),
+                           parameters)
+        ranked = {}
+        for date, name, item_id, total in rows:
+            ranked.setdefault(date, []).append(((name, item_id), total / 100 if weight == MONEY else total))
+        return ranked
+
+
+def _ranking_sql(keys, aggregate, table, conditions, limit):
+    # Totals per (date, keys), ordered within each date by total, then first appearance
+    sql = (f"SELECT date, {keys}, total FROM ("
+           f"SELECT date, {keys}, total, "
+           f"ROW_NUMBER() OVER (PARTITION BY date ORDER BY total DESC, first) AS place "
+           f"FROM (SELECT date, {keys}, {aggregate} AS total, MIN(rowid) AS first FROM {table} "
+           f"WHERE {' AND '.join(conditions)} GROUP BY date, {keys}))")
+    if limit:
+        sql += f" WHERE place <= {int(limit)}"
+    return sql + " ORDER BY date, place"